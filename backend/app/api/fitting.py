@@ -1,8 +1,17 @@
-from fastapi import APIRouter, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from app.services.fitting_service import fitting_service
-from app.models.fitting import FittingResponse
+from app.services.fitting_jobs import (
+    fitting_jobs, validate_callback_url, CallbackURLError, QueueFullError, DONE, FAILED,
+    ERROR_RATE_LIMITED, ERROR_INVALID_IMAGE,
+)
+from app.utils.bounded_executor import ExecutorSaturatedError
+from app.utils.uploads import read_upload, read_raw_body
+from app.utils.image_prep import InvalidImageError
+from app.models.fitting import FittingResponse, FittingJob
 
 router = APIRouter()
 
@@ -11,20 +20,26 @@ class TryOnRequest(BaseModel):
     outfit_items: List[Dict[str, Any]] # List of items from style recommendation
     language: str = "en"
 
+class TryOnJobRequest(TryOnRequest):
+    callback_url: Optional[str] = None # receives the finished job as a POST
+
 class StyleEditRequest(BaseModel):
     user_image: str # base64
     command: str
     language: str = "en"
 
-@router.post("/try-on", response_model=FittingResponse)
-async def virtual_try_on(request: TryOnRequest):
+async def _try_on(user_image: Union[str, bytes], outfit_items: List[Dict[str, Any]], language: str) -> FittingResponse:
     try:
         response = await fitting_service.process_fitting(
-            user_image=request.user_image,
-            outfit_items=request.outfit_items,
-            language=request.language
+            user_image=user_image,
+            outfit_items=outfit_items,
+            language=language
         )
         return response
+    except ExecutorSaturatedError:
+        raise HTTPException(status_code=503, detail="Image generation is busy. Please try again in a moment.", headers={"Retry-After": "10"})
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         print(f"[fitting] ERROR: {e}")
@@ -33,17 +48,145 @@ async def virtual_try_on(request: TryOnRequest):
              raise HTTPException(status_code=429, detail="Too many requests. Please try again in a moment.")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/style-edit", response_model=FittingResponse)
-async def style_edit(request: StyleEditRequest):
+async def _style_edit(user_image: Union[str, bytes], command: str, language: str) -> FittingResponse:
     try:
         response = await fitting_service.process_style_edit(
-            user_image=request.user_image,
-            command=request.command,
-            language=request.language
+            user_image=user_image,
+            command=command,
+            language=language
         )
         return response
+    except ExecutorSaturatedError:
+        raise HTTPException(status_code=503, detail="Image generation is busy. Please try again in a moment.", headers={"Retry-After": "10"})
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         print(f"[fitting] ERROR: {e}")
         print(f"[fitting] TRACEBACK: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_outfit_items(raw: str) -> List[Dict[str, Any]]:
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        items = None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="outfit_items must be a JSON array of objects")
+    return items
+
+@router.post("/try-on", response_model=FittingResponse)
+async def virtual_try_on(request: TryOnRequest):
+    return await _try_on(request.user_image, request.outfit_items, request.language)
+
+@router.post("/try-on/upload", response_model=FittingResponse)
+async def virtual_try_on_upload(
+    user_image: UploadFile = File(...),
+    outfit_items: str = Form(...), # JSON array, same shape as TryOnRequest.outfit_items
+    language: str = Form("en"),
+):
+    """multipart/form-data variant of /try-on: the photo as a file part instead of base64."""
+    items = _parse_outfit_items(outfit_items)
+    return await _try_on(await read_upload(user_image), items, language)
+
+@router.post("/try-on/raw", response_model=FittingResponse)
+async def virtual_try_on_raw(
+    request: Request,
+    outfit_items: str = Query(...), # JSON array
+    language: str = "en",
+):
+    """Raw-binary variant of /try-on: the request body is the photo (image/* or application/octet-stream)."""
+    items = _parse_outfit_items(outfit_items)
+    return await _try_on(await read_raw_body(request), items, language)
+
+@router.post("/style-edit", response_model=FittingResponse)
+async def style_edit(request: StyleEditRequest):
+    return await _style_edit(request.user_image, request.command, request.language)
+
+@router.post("/style-edit/upload", response_model=FittingResponse)
+async def style_edit_upload(
+    user_image: UploadFile = File(...),
+    command: str = Form(...),
+    language: str = Form("en"),
+):
+    """multipart/form-data variant of /style-edit."""
+    return await _style_edit(await read_upload(user_image), command, language)
+
+@router.post("/style-edit/raw", response_model=FittingResponse)
+async def style_edit_raw(request: Request, command: str = Query(...), language: str = "en"):
+    """Raw-binary variant of /style-edit: the request body is the photo."""
+    return await _style_edit(await read_raw_body(request), command, language)
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _get_job(job_id: str) -> Dict[str, Any]:
+    job = await fitting_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/try-on/jobs", response_model=FittingJob, status_code=202)
+async def submit_try_on_job(request: TryOnJobRequest):
+    """
+    Queue a try-on and return immediately. Follow it with GET /jobs/{job_id},
+    /jobs/{job_id}/result or /jobs/{job_id}/events, or pass callback_url (https, public host).
+    """
+    if request.callback_url:
+        try:
+            await validate_callback_url(request.callback_url)
+        except CallbackURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await fitting_jobs.submit(
+            user_image=request.user_image,
+            outfit_items=request.outfit_items,
+            language=request.language,
+            callback_url=request.callback_url,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+@router.get("/jobs/{job_id}", response_model=FittingJob)
+async def get_try_on_job(job_id: str):
+    return await _get_job(job_id)
+
+@router.get("/jobs/{job_id}/result", response_model=FittingResponse)
+async def get_try_on_result(job_id: str):
+    job = await _get_job(job_id)
+    if job["status"] == FAILED:
+        if job["error"] == ERROR_INVALID_IMAGE:
+            raise HTTPException(status_code=400, detail="Invalid image format")
+        if job["error"] == ERROR_RATE_LIMITED:
+            raise HTTPException(status_code=429, detail="Too many requests. Please try again in a moment.")
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@router.get("/jobs/{job_id}/events")
+async def try_on_job_events(job_id: str):
+    """
+    Server-sent events for a try-on job:
+    - status: {job_id, status, stage, progress} on every status/stage change
+      (stage image_fetch → generation)
+    - result: the FittingResponse when the job finishes
+    - error: {"detail": ...} if the job fails
+    """
+    await _get_job(job_id)
+
+    async def _events():
+        async for job in fitting_jobs.watch(job_id):
+            if job["status"] == DONE:
+                yield _sse("result", job["result"])
+            elif job["status"] == FAILED:
+                yield _sse("error", {"detail": job["error"]})
+            else:
+                yield _sse("status", {k: job[k] for k in ("job_id", "status", "stage", "progress")})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,11 +4,13 @@ Handles image upload and batch style analysis endpoints.
 API keys are never exposed to the frontend.
 """
 import logging
-from typing import List
-from fastapi import APIRouter, HTTPException
+from typing import List, Union
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
 from pydantic import BaseModel
 from app.services.vision_service import VisionService
 from app.services.openai_service import OpenAIService
+from app.utils.bounded_executor import ExecutorSaturatedError
+from app.utils.uploads import read_uploads, read_raw_body
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -31,24 +33,23 @@ class OOTDRecommendRequest(BaseModel):
     language: str = "en"
 
 
-@router.post("/analyze")
-async def analyze_ootd(request: OOTDAnalyzeRequest):
-    """
-    Analyze a batch of OOTD images using Gemini Vision.
-    Returns a UserStyleProfile JSON.
-    """
-    try:
-        if not request.images:
-            raise HTTPException(status_code=400, detail="No images provided")
-        if len(request.images) > 10:
-            raise HTTPException(status_code=400, detail="Maximum 10 images allowed")
+def _check_image_count(count: int) -> None:
+    if not count:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if count > 10:
+        raise HTTPException(status_code=400, detail="Maximum 10 images allowed")
 
+
+async def _analyze(images: List[Union[str, bytes]], language: str) -> dict:
+    try:
         profile = await vision_service.analyze_ootd_batch(
-            images_b64=request.images,
-            language=request.language
+            images_b64=images,
+            language=language
         )
         return {"status": "success", "style_profile": profile}
 
+    except ExecutorSaturatedError:
+        raise HTTPException(status_code=503, detail="Image analysis is busy. Please try again in a moment.", headers={"Retry-After": "10"})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -56,6 +57,33 @@ async def analyze_ootd(request: OOTDAnalyzeRequest):
         raise HTTPException(status_code=500, detail="Failed to analyze images")
 
 
+@router.post("/analyze")
+async def analyze_ootd(request: OOTDAnalyzeRequest):
+    """
+    Analyze a batch of OOTD images using Gemini Vision.
+    Returns a UserStyleProfile JSON.
+    """
+    _check_image_count(len(request.images))
+    return await _analyze(request.images, request.language)
+
+
+@router.post("/analyze/upload")
+async def analyze_ootd_upload(images: List[UploadFile] = File(...), language: str = Form("en")):
+    """
+    multipart/form-data variant of /analyze: up to 10 `images` file parts instead of base64.
+    """
+    _check_image_count(len(images))
+    return await _analyze(await read_uploads(images), language)
+
+
+@router.post("/analyze/raw")
+async def analyze_ootd_raw(request: Request, language: str = "en"):
+    """
+    Raw-binary variant of /analyze for a single photo: the request body is the image.
+    """
+    return await _analyze([await read_raw_body(request)], language)
+
+
 @router.post("/recommend")
 async def recommend_from_ootd(request: OOTDRecommendRequest):
     """
@@ -1,9 +1,12 @@
 import os
 import urllib.parse
-import httpx
-import asyncio
 from fastapi import APIRouter, Query
 from fastapi.responses import RedirectResponse, Response, JSONResponse
+from app.utils.http_client import http_clients
+from app.utils.cache import get_cache
+from app.utils.singleflight import get_singleflight
+from app.utils.persistent_cache import get_persistent_cache
+from app.utils.rate_limiter import naver_limiter
 
 router = APIRouter()
 
@@ -11,24 +14,41 @@ NAVER_SHOP_CLIENT_ID = os.getenv("NAVER_SHOP_CLIENT_ID", "")
 NAVER_SHOP_CLIENT_SECRET = os.getenv("NAVER_SHOP_CLIENT_SECRET", "")
 NAVER_SHOP_URL = "https://openapi.naver.com/v1/search/shop.json"
 
-# 인메모리 캐시: search_key → image_url
-_image_cache: dict[str, str] = {}
-
-# Singleton HTTP Client
-_http_client: httpx.AsyncClient | None = None
-
-async def _get_client() -> httpx.AsyncClient:
-    global _http_client
-    if _http_client is None or _http_client.is_closed:
-        _http_client = httpx.AsyncClient(timeout=5.0)
-    return _http_client
-
-async def _search_naver_shopping(query: str, retry: bool = True) -> str | None:
-    """네이버 쇼핑 API로 상품 검색 → 첫 번째 결과의 image URL 반환"""
-    if not NAVER_SHOP_CLIENT_ID or not NAVER_SHOP_CLIENT_SECRET:
-        print("[placeholder] NAVER API keys not set")
-        return None
-
+# 인메모리 캐시 (LRU + TTL, 크기 제한)
+# placeholder_image: search_key → image_url
+_image_cache = get_cache("placeholder_image", max_entries=5000, max_bytes=4 * 1024 * 1024, default_ttl=86400)
+# product_info: search_key → {image, link, title, price, mall}
+_product_cache = get_cache("product_info", max_entries=5000, max_bytes=8 * 1024 * 1024, default_ttl=86400)
+
+# 영구 캐시 (SQLite, 워커 간 공유): naver query → {image, link, title, price, mall} 또는 None
+_naver_store = get_persistent_cache(
+    "naver_shopping",
+    ttl=int(os.getenv("NAVER_CACHE_TTL", str(7 * 86400))),
+    negative_ttl=int(os.getenv("NAVER_NEGATIVE_CACHE_TTL", str(86400))),
+)
+
+# 영구 캐시: search_key → 3단계 fallback 중 성공한 단계 {tier, query, result} 또는 None (전 단계 실패)
+_resolution_store = get_persistent_cache(
+    "placeholder_resolution",
+    ttl=int(os.getenv("NAVER_CACHE_TTL", str(7 * 86400))),
+    negative_ttl=int(os.getenv("NAVER_NEGATIVE_CACHE_TTL", str(86400))),
+)
+
+# 전 단계 실패 결과의 인메모리 유지 시간 (초)
+NEGATIVE_CACHE_TTL = 3600
+
+# 렌더링된 SVG 폴백: (text, brand, w, h) → bytes
+_svg_cache = get_cache("placeholder_svg", max_entries=2000, max_bytes=2 * 1024 * 1024, default_ttl=86400)
+
+# 인메모리 캐시 miss 구분용
+_MISSING = object()
+
+# 동일 검색 키에 대한 동시 요청 병합
+_lookup_flight = get_singleflight("placeholder_lookup")
+
+async def _request_naver_shopping(query: str, retry: bool = True) -> dict | None:
+    """네이버 쇼핑 API 호출 → 첫 번째 결과의 image, link, title, price, mall 반환
+    결과가 없으면 None, API 오류는 예외로 전달 (오류는 캐시하지 않기 위함)"""
     headers = {
         "X-Naver-Client-Id": NAVER_SHOP_CLIENT_ID,
         "X-Naver-Client-Secret": NAVER_SHOP_CLIENT_SECRET,
@@ -41,36 +61,87 @@ async def _search_naver_shopping(query: str, retry: bool = True) -> str | None:
         "exclude": "used:rental:cbshop",
     }
 
+    client = http_clients.get(NAVER_SHOP_URL)
+    await naver_limiter.acquire()
+    resp = await client.get(NAVER_SHOP_URL, headers=headers, params=params)
+
+    # 429 Too Many Requests - 버킷을 1초간 비워 다른 요청도 함께 늦춘 뒤 재시도
+    if resp.status_code == 429 and retry:
+        print(f"[placeholder] Rate limited, backing off 1s and retrying: {query}")
+        naver_limiter.pause(1.0)
+        return await _request_naver_shopping(query, retry=False)
+
+    resp.raise_for_status()
+    items = resp.json().get("items", [])
+    if not items:
+        return None
+
+    item = items[0]
+    image_url = item.get("image", "")
+    # HTTP -> HTTPS 변환 (혼합 콘텐츠 방지)
+    if image_url and image_url.startswith("http://"):
+        image_url = image_url.replace("http://", "https://", 1)
+    return {
+        "image": image_url,
+        "link": item.get("link", ""),
+        "title": item.get("title", "").replace("<b>", "").replace("</b>", ""),
+        "price": item.get("lprice", ""),
+        "mall": item.get("mallName", "")
+    }
+
+
+async def _naver_lookup(query: str) -> tuple[bool, dict | None]:
+    """영구 캐시 경유 네이버 쇼핑 검색 → (확정 여부, 결과)
+    API 키 누락/오류는 확정되지 않은 실패로 보고 캐시하지 않음"""
+    if not NAVER_SHOP_CLIENT_ID or not NAVER_SHOP_CLIENT_SECRET:
+        print("[placeholder] NAVER API keys not set")
+        return False, None
+
+    cache_key = query.lower().strip()
+    found, cached = await _naver_store.get(cache_key)
+    if found:
+        return True, cached
+
     try:
-        client = await _get_client()
-        resp = await client.get(NAVER_SHOP_URL, headers=headers, params=params)
-        
-        # 429 Too Many Requests - 재시도
-        if resp.status_code == 429 and retry:
-            print(f"[placeholder] Rate limited, waiting 1s and retrying: {query}")
-            await asyncio.sleep(1.0)
-            return await _search_naver_shopping(query, retry=False)
-
-        resp.raise_for_status()
-        data = resp.json()
-        items = data.get("items", [])
-        if items:
-            image_url = items[0].get("image")
-            if image_url:
-                # HTTP -> HTTPS 변환 (혼합 콘텐츠 방지)
-                if image_url.startswith("http://"):
-                    image_url = image_url.replace("http://", "https://", 1)
-                print(f"[placeholder] Found: {query} → {image_url}")
-                return image_url
-        print(f"[placeholder] No results for: {query}")
+        result = await _request_naver_shopping(query)
     except Exception as e:
         print(f"[placeholder] Naver API error: {e}")
+        return False, None
+
+    if result:
+        print(f"[placeholder] Found: {query} → {result['image']}")
+    else:
+        print(f"[placeholder] No results for: {query}")
+    # 결과 없음(None)도 저장 → 같은 쿼리로 할당량을 다시 쓰지 않음
+    await _naver_store.set(cache_key, result)
+    return True, result
+
+
+async def _search_naver_shopping_detail(query: str) -> dict | None:
+    """네이버 쇼핑 검색 후 image, link, title을 딕셔너리로 반환"""
+    _, result = await _naver_lookup(query)
+    return result
 
+
+async def _search_naver_shopping(query: str) -> str | None:
+    """네이버 쇼핑 API로 상품 검색 → 첫 번째 결과의 image URL 반환"""
+    result = await _search_naver_shopping_detail(query)
+    if result and result.get("image"):
+        return result["image"]
     return None
 
 
 def _svg_fallback(text: str, brand: str, w: int, h: int) -> Response:
     """최종 폴백: SVG 플레이스홀더"""
+    svg_key = f"{text}|{brand}|{w}|{h}"
+    content = _svg_cache.get(svg_key)
+    if content is None:
+        content = _render_svg(text, brand, w, h)
+        _svg_cache.set(svg_key, content)
+    return Response(content=content, media_type="image/svg+xml")
+
+
+def _render_svg(text: str, brand: str, w: int, h: int) -> bytes:
     svg = f'''<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}">
         <rect width="100%" height="100%" fill="#f3f4f6"/>
         <text x="50%" y="45%" text-anchor="middle"
@@ -78,7 +149,7 @@ def _svg_fallback(text: str, brand: str, w: int, h: int) -> Response:
         <text x="50%" y="60%" text-anchor="middle"
               font-family="Arial" font-size="11" fill="#d1d5db">{brand}</text>
     </svg>'''
-    return Response(content=svg.encode(), media_type="image/svg+xml")
+    return svg.encode()
 
 
 ALLOWED_BRANDS = {
@@ -133,6 +204,93 @@ def _build_search_query(brand: str, item_name: str, gender: str = None) -> str:
     
     return f"{brand} {gender_prefix}{item_name}"
 
+def _fallback_queries(query1: str, refined_text: str, search_brand: str, gender: str | None) -> list[str]:
+    """3단계 fallback 쿼리: {brand} {item_name} → {item_name} → {brand}"""
+    query2 = f"{'남성 ' if gender == 'male' else '여성 ' if gender == 'female' else ''}{refined_text}".strip()
+    return [query1, query2, search_brand]
+
+
+async def _resolve_fallback(cache_key: str, queries: list[str]) -> tuple[bool, dict | None]:
+    """3단계 fallback 검색 → (확정 여부, 결과). 성공한 단계(또는 전 단계의 확정된 실패)를
+    영구 캐시에 기록해 같은 키의 다음 요청은 바로 결과로 건너뜀"""
+    found, resolved = await _resolution_store.get(cache_key)
+    if found:
+        return True, resolved["result"] if resolved else None
+
+    definitive = True
+    for tier, query in enumerate(queries, start=1):
+        if tier == 1:
+            print(f"[placeholder] Try 1: {query}")
+        else:
+            print(f"[placeholder] Try {tier - 1} failed, trying: {query}")
+        ok, result = await _naver_lookup(query)
+        definitive = definitive and ok
+        if result and result.get("image"):
+            await _resolution_store.set(cache_key, {"tier": tier, "query": query, "result": result})
+            return True, result
+
+    if definitive:
+        await _resolution_store.set(cache_key, None)
+    return definitive, None
+
+
+async def _lookup(cache_key: str, queries: list[str]) -> tuple[bool, dict | None]:
+    # 동일 키 동시 요청은 한 번만 검색 (image / product-info 공용)
+    return await _lookup_flight.do(cache_key, lambda: _resolve_fallback(cache_key, queries))
+
+
+# Hanbok Brand Mapping for Naver Search
+HANBOK_SEARCH_MAP = {
+    "LEESLE": "리슬",
+    "TCHAI KIM": "차이킴",
+    "OUWR": "아워",
+    "Bukchonzalak": "북촌잘락",
+    "Soosulhwa": "수설화"
+}
+
+# 영어 상품명 -> 한국어 변환 (우선순위 높음)
+_EN_TO_KR = {
+    "oversized tee": "오버사이즈 티셔츠", "wide pants": "와이드 팬츠",
+    "bucket hat": "버킷햇", "graphic sweatshirt": "그래픽 맨투맨",
+    "denim jacket": "데님 자켓", "denim": "데님 자켓",
+    "beanie": "비니", "jogger pants": "조거 팬츠",
+    "logo sweatshirt": "로고 맨투맨", "hoodie": "후디",
+    "cargo pants": "카고 팬츠", "crossbody bag": "크로스백",
+    "sneakers": "스니커즈", "mini skirt": "미니스커트",
+    "cardigan": "가디건", "bomber jacket": "봄버 자켓",
+    "pleated skirt": "플리츠 스커트", "tote bag": "토트백",
+    "cap": "볼캡", "windbreaker": "바람막이",
+}
+
+
+def _search_plan(text: str, brand: str, gender: str | None) -> tuple[str, list[str]]:
+    """(decoded) 상품명/브랜드 → (검색 키, 3단계 fallback 쿼리). /image, /product-info 공용"""
+    search_brand = HANBOK_SEARCH_MAP.get(brand, brand)
+    refined_text = _EN_TO_KR.get(text.lower().strip(), text)
+
+    # 브랜드 및 성별 필터링 적용 (1차 쿼리 생성용)
+    query1 = _build_search_query(search_brand, refined_text, gender)
+    cache_key = f"{gender}_{query1}".lower().strip()
+    return cache_key, _fallback_queries(query1, refined_text, search_brand, gender)
+
+
+async def warm_product(text: str, brand: str, gender: str | None = None) -> bool:
+    """
+    Resolve an item the way /image and /product-info will, filling both caches ahead of time.
+    True only if an image URL is (now) cached; a cached negative ("") counts as not found.
+    """
+    cache_key, queries = _search_plan(text, brand, gender)
+    cached = _image_cache.get(cache_key, _MISSING)
+    if cached is not _MISSING:
+        return bool(cached)
+    definitive, result = await _lookup(cache_key, queries)
+    if result or definitive:
+        ttl = None if result else NEGATIVE_CACHE_TTL
+        _image_cache.set(cache_key, result["image"] if result else "", ttl=ttl)
+        _product_cache.set(cache_key, result, ttl=ttl)
+    return bool(result)
+
+
 @router.get("/image")
 async def placeholder_image(
     text: str = Query("Item"),
@@ -143,67 +301,22 @@ async def placeholder_image(
 ):
     decoded_text = urllib.parse.unquote_plus(text)
     decoded_brand = urllib.parse.unquote_plus(brand)
+    print(f"[placeholder] Search start for: \"{decoded_brand} {decoded_text}\"")
 
-    # Hanbok Brand Mapping for Naver Search
-    HANBOK_SEARCH_MAP = {
-        "LEESLE": "리슬",
-        "TCHAI KIM": "차이킴", 
-        "OUWR": "아워",
-        "Bukchonzalak": "북촌잘락",
-        "Soosulhwa": "수설화"
-    }
-    search_brand = HANBOK_SEARCH_MAP.get(decoded_brand, decoded_brand)
-
-    # 0. 영어 상품명 -> 한국어 변환 (우선순위 높음)
-    _en_to_kr = {
-        "oversized tee": "오버사이즈 티셔츠", "wide pants": "와이드 팬츠",
-        "bucket hat": "버킷햇", "graphic sweatshirt": "그래픽 맨투맨",
-        "denim jacket": "데님 자켓", "denim": "데님 자켓",
-        "beanie": "비니", "jogger pants": "조거 팬츠",
-        "logo sweatshirt": "로고 맨투맨", "hoodie": "후디",
-        "cargo pants": "카고 팬츠", "crossbody bag": "크로스백",
-        "sneakers": "스니커즈", "mini skirt": "미니스커트",
-        "cardigan": "가디건", "bomber jacket": "봄버 자켓",
-        "pleated skirt": "플리츠 스커트", "tote bag": "토트백",
-        "cap": "볼캡", "windbreaker": "바람막이",
-    }
-    text_lower = decoded_text.lower().strip()
-    refined_text = _en_to_kr.get(text_lower, decoded_text)
-
-    # 1. 브랜드 및 성별 필터링 적용 (1차 쿼리 생성용)
-    refined_query = _build_search_query(search_brand, refined_text, gender)
-    print(f"[placeholder] Search start for: \"{search_brand} {decoded_text}\"")
-
-    cache_key = f"{gender}_{refined_query}".lower().strip()
+    cache_key, queries = _search_plan(decoded_text, decoded_brand, gender)
 
-    # 1) 캐시 히트
-    if cache_key in _image_cache:
-        return RedirectResponse(
-            url=_image_cache[cache_key],
-            status_code=302,
-            headers={"Cache-Control": "public, max-age=86400"},
-        )
+    # 1) 캐시 히트 ("" = 이전에 전 단계 실패)
+    image_url = _image_cache.get(cache_key, _MISSING)
 
     # 2) 3단계 fallback 검색
-    # Try 1: {brand} {item_name} (refined_query)
-    print(f"[placeholder] Try 1: {refined_query}")
-    image_url = await _search_naver_shopping(refined_query)
-
-    if not image_url:
-        # Try 2: {item_name}
-        query2 = f"{'남성 ' if gender == 'male' else '여성 ' if gender == 'female' else ''}{refined_text}".strip()
-        print(f"[placeholder] Try 1 failed, trying: {query2}")
-        image_url = await _search_naver_shopping(query2)
-
-    if not image_url:
-        # Try 3: {brand}
-        query3 = search_brand
-        print(f"[placeholder] Try 2 failed, trying: {query3}")
-        image_url = await _search_naver_shopping(query3)
+    if image_url is _MISSING:
+        definitive, result = await _lookup(cache_key, queries)
+        image_url = result["image"] if result else ""
+        if image_url or definitive:
+            _image_cache.set(cache_key, image_url, ttl=None if image_url else NEGATIVE_CACHE_TTL)
 
     # 3) 결과 반환
     if image_url:
-        _image_cache[cache_key] = image_url
         return RedirectResponse(
             url=image_url,
             status_code=302,
@@ -215,113 +328,21 @@ async def placeholder_image(
     return _svg_fallback(decoded_text, decoded_brand, w, h)
 
 
-async def _search_naver_shopping_detail(query: str) -> dict | None:
-    """네이버 쇼핑 검색 후 image, link, title을 딕셔너리로 반환"""
-    if not NAVER_SHOP_CLIENT_ID or not NAVER_SHOP_CLIENT_SECRET:
-        return None
-    
-    client = await _get_client()
-    try:
-        resp = await client.get(
-            NAVER_SHOP_URL,
-            params={"query": query, "display": 1, "sort": "sim", "exclude": "used:rental:cbshop"},
-            headers={
-                "X-Naver-Client-Id": NAVER_SHOP_CLIENT_ID,
-                "X-Naver-Client-Secret": NAVER_SHOP_CLIENT_SECRET,
-            },
-        )
-        if resp.status_code == 200:
-            data = resp.json()
-            items = data.get("items", [])
-            if items:
-                item = items[0]
-                image_url = item.get("image", "")
-                if image_url and image_url.startswith("http://"):
-                    image_url = image_url.replace("http://", "https://", 1)
-                return {
-                    "image": image_url,
-                    "link": item.get("link", ""),
-                    "title": item.get("title", "").replace("<b>", "").replace("</b>", ""),
-                    "price": item.get("lprice", ""),
-                    "mall": item.get("mallName", "")
-                }
-        elif resp.status_code == 429:
-            await asyncio.sleep(1)
-            # 1회 재시도
-            resp2 = await client.get(
-                NAVER_SHOP_URL,
-                params={"query": query, "display": 1, "sort": "sim", "exclude": "used:rental:cbshop"},
-                headers={
-                    "X-Naver-Client-Id": NAVER_SHOP_CLIENT_ID,
-                    "X-Naver-Client-Secret": NAVER_SHOP_CLIENT_SECRET,
-                },
-            )
-            if resp2.status_code == 200:
-                data = resp2.json()
-                items = data.get("items", [])
-                if items:
-                    item = items[0]
-                    image_url = item.get("image", "")
-                    if image_url and image_url.startswith("http://"):
-                        image_url = image_url.replace("http://", "https://", 1)
-                    return {
-                        "image": image_url,
-                        "link": item.get("link", ""),
-                        "title": item.get("title", "").replace("<b>", "").replace("</b>", ""),
-                        "price": item.get("lprice", ""),
-                        "mall": item.get("mallName", "")
-                    }
-    except Exception as e:
-        print(f"[placeholder] Detail search error: {e}")
-    return None
-
-
 @router.get("/product-info")
 async def product_info(text: str = "Item", brand: str = "", gender: str = None):
     """상품 이미지 URL과 네이버 쇼핑 링크를 JSON으로 반환"""
     decoded_text = urllib.parse.unquote_plus(text)
     decoded_brand = urllib.parse.unquote_plus(brand)
-    
-    # Hanbok Mapping
-    HANBOK_SEARCH_MAP = {
-        "LEESLE": "리슬", "TCHAI KIM": "차이킴", "OUWR": "아워", "Bukchonzalak": "북촌잘락", "Soosulhwa": "수설화"
-    }
-    search_brand = HANBOK_SEARCH_MAP.get(decoded_brand, decoded_brand)
-
-    # 영어 상품명 -> 한국어 변환
-    _en_to_kr = {
-        "oversized tee": "오버사이즈 티셔츠", "wide pants": "와이드 팬츠",
-        "bucket hat": "버킷햇", "graphic sweatshirt": "그래픽 맨투맨",
-        "denim jacket": "데님 자켓", "denim": "데님 자켓",
-        "beanie": "비니", "jogger pants": "조거 팬츠",
-        "logo sweatshirt": "로고 맨투맨", "hoodie": "후디",
-        "cargo pants": "카고 팬츠", "crossbody bag": "크로스백",
-        "sneakers": "스니커즈", "mini skirt": "미니스커트",
-        "cardigan": "가디건", "bomber jacket": "봄버 자켓",
-        "pleated skirt": "플리츠 스커트", "tote bag": "토트백",
-        "cap": "볼캡", "windbreaker": "바람막이",
-    }
-    text_lower = decoded_text.lower().strip()
-    refined_text = _en_to_kr.get(text_lower, decoded_text)
-    
-    # 3단계 fallback apply
-    # Try 1: {brand} {item_name}
-    query1 = _build_search_query(search_brand, refined_text, gender)
-    print(f"[product-info] Try 1: {query1}")
-    result = await _search_naver_shopping_detail(query1)
-    
-    if not result:
-        # Try 2: {item_name}
-        query2 = f"{'남성 ' if gender == 'male' else '여성 ' if gender == 'female' else ''}{refined_text}".strip()
-        print(f"[product-info] Try 1 failed, trying: {query2}")
-        result = await _search_naver_shopping_detail(query2)
-    
-    if not result:
-        # Try 3: {brand}
-        query3 = search_brand
-        print(f"[product-info] Try 2 failed, trying: {query3}")
-        result = await _search_naver_shopping_detail(query3)
-    
+
+    # 3단계 fallback: {brand} {item_name} → {item_name} → {brand}
+    cache_key, queries = _search_plan(decoded_text, decoded_brand, gender)
+
+    result = _product_cache.get(cache_key, _MISSING)
+    if result is _MISSING:
+        definitive, result = await _lookup(cache_key, queries)
+        if result or definitive:
+            _product_cache.set(cache_key, result, ttl=None if result else NEGATIVE_CACHE_TTL)
+
     if result:
         return JSONResponse(result)
     
@@ -1,17 +1,28 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
+import os
+import asyncio
+from zoneinfo import ZoneInfo
 import json
 import logging
 from app.models.route import RouteResponse, RoutePlan, RouteStep, TransitInfo
 from app.services.odsay_service import odsay_service
 from app.services.map_service import map_service
 from app.services.openai_service import openai_service
-from app.api.stores import STORES # Provide access to store data
+from app.services.store_catalog import store_catalog
+from app.services.route_optimizer import route_optimizer, stop_from_store, parse_hhmm, format_clock, DWELL_MINUTES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+SEOUL_TZ = ZoneInfo("Asia/Seoul")
+# 동시에 조회할 ODsay 구간 수
+LEG_CONCURRENCY = 4
+# 한 번에 계획할 수 있는 최대 매장 수 (로컬 solver 비용이 매장 수에 따라 급증)
+MAX_ROUTE_STORES = int(os.getenv("MAX_ROUTE_STORES", "20"))
+
 class QuickRouteRequest(BaseModel):
     start_lat: float
     start_lng: float
@@ -22,16 +33,15 @@ class RoutePlanRequest(BaseModel):
     start_lng: float
     store_ids: List[str]
     language: str = "en"
+    start_time: str = "10:00" # HH:MM, Seoul local time
+    optimizer: str = "local" # "local" (in-process solver) or "llm" (GPT-4o ordering)
 
 def get_store_by_id(store_id: str):
-    for store in STORES:
-        if store.id == store_id:
-            return store
-    return None
+    return store_catalog.get(store_id)
 
 @router.post("/quick", response_model=TransitInfo)
 async def get_quick_route(request: QuickRouteRequest):
-    if not STORES:
+    if not len(store_catalog):
         raise HTTPException(status_code=503, detail="Route service unavailable (No static stores)")
         
     store = get_store_by_id(request.end_store_id)
@@ -56,20 +66,7 @@ async def get_quick_route(request: QuickRouteRequest):
         navigation_links=links
     )
 
-@router.post("/plan", response_model=RouteResponse)
-async def plan_shopping_route(request: RoutePlanRequest):
-    if not STORES:
-        raise HTTPException(status_code=503, detail="Route service unavailable (No static stores)")
-
-    if not request.store_ids:
-        raise HTTPException(status_code=400, detail="No stores selected")
-    
-    selected_stores = [get_store_by_id(sid) for sid in request.store_ids if get_store_by_id(sid)]
-    
-    if not selected_stores:
-        raise HTTPException(status_code=404, detail="No valid stores found")
-
-    # 1. Optimize Order using GPT-4o (Solving TSP heuristically)
+async def _optimize_with_llm(request: RoutePlanRequest, selected_stores) -> List[str]:
     # Construct context for GPT
     store_locations = [
         {"id": s.id, "name": s.name.en, "lat": s.location.lat, "lng": s.location.lng, "hours": s.hours.open + "-" + s.hours.close}
@@ -87,34 +84,80 @@ async def plan_shopping_route(request: RoutePlanRequest):
     Return JSON ONLY: {{"order": ["store_id_1", "store_id_2", ...]}}
     """
     
+    selected_ids = {s.id for s in selected_stores}
+
+    def _validate(data):
+        order = data.get("order")
+        if not isinstance(order, list) or len(order) != len(selected_ids) or set(order) != selected_ids:
+            raise ValueError("order must list every selected store exactly once")
+
     try:
-        response = await openai_service.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
+        data, _ = await openai_service.router.complete_json(
+            "route_order",
+            [{"role": "user", "content": prompt}],
+            validate=_validate,
         )
-        content = response.choices[0].message.content
-        optimized_order_ids = json.loads(content)["order"]
+        return data["order"]
     except Exception as e:
         logger.error(f"Route optimization failed: {e}")
         # Fallback: maintain original selection order
-        optimized_order_ids = request.store_ids
+        return [s.id for s in selected_stores]
+
+@router.post("/plan", response_model=RouteResponse)
+async def plan_shopping_route(request: RoutePlanRequest):
+    if not len(store_catalog):
+        raise HTTPException(status_code=503, detail="Route service unavailable (No static stores)")
 
-    # 2. Build Route Steps
+    if not request.store_ids:
+        raise HTTPException(status_code=400, detail="No stores selected")
+
+    # 중복 제거 (선택 순서 유지)
+    store_ids = list(dict.fromkeys(request.store_ids))
+    if len(store_ids) > MAX_ROUTE_STORES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROUTE_STORES} stores can be planned at once")
+
+    selected_stores = [store for store in map(get_store_by_id, store_ids) if store]
+    
+    if not selected_stores:
+        raise HTTPException(status_code=404, detail="No valid stores found")
+
+    start_minute = parse_hhmm(request.start_time, 10 * 60)
+
+    # 1. Optimize Order (local solver by default, LLM ordering only when explicitly requested)
+    if request.optimizer == "llm":
+        optimized_order_ids = await _optimize_with_llm(request, selected_stores)
+    else:
+        weekday = datetime.now(SEOUL_TZ).weekday()
+        stops = [stop_from_store(s, weekday) for s in selected_stores]
+        # solver는 CPU 작업이므로 이벤트 루프 밖에서
+        schedule = await asyncio.to_thread(route_optimizer.solve, (request.start_lat, request.start_lng), stops, start_minute)
+        optimized_order_ids = [stops[i].id for i in schedule.order]
+        if schedule.late_stops:
+            logger.info(f"Route plan has {schedule.late_stops} stop(s) that cannot be finished before closing")
+
+    # 2. Transit legs, computed concurrently (bounded)
+    ordered_stores = [store for store in map(get_store_by_id, optimized_order_ids) if store]
+    origins = [(request.start_lat, request.start_lng)] + [
+        (s.location.lat, s.location.lng) for s in ordered_stores[:-1]
+    ]
+    semaphore = asyncio.Semaphore(LEG_CONCURRENCY)
+
+    async def _leg(origin, store):
+        async with semaphore:
+            return await odsay_service.get_transit_route(
+                origin[0], origin[1],
+                store.location.lat, store.location.lng
+            )
+
+    transits = await asyncio.gather(*[_leg(o, s) for o, s in zip(origins, ordered_stores)])
+
+    # 3. Build Route Steps
     steps = []
     current_lat, current_lng = request.start_lat, request.start_lng
     total_time = 0
+    clock = start_minute
     
-    for idx, sid in enumerate(optimized_order_ids):
-        store = get_store_by_id(sid)
-        if not store: continue
-        
-        # Get transit from current loc to this store
-        transit = await odsay_service.get_transit_route(
-            current_lat, current_lng,
-            store.location.lat, store.location.lng
-        )
-        
+    for idx, (store, transit) in enumerate(zip(ordered_stores, transits)):
         links = map_service.generate_navigation_links(
             current_lat, current_lng,
             store.location.lat, store.location.lng,
@@ -129,12 +172,13 @@ async def plan_shopping_route(request: RoutePlanRequest):
         )
         
         # Assume 45 mins shopping time per store
-        shopping_time = 45
+        shopping_time = DWELL_MINUTES
         total_time += transit["duration_min"] + shopping_time
         
-        # Mock arrival time calculation (start at 10:00 AM)
-        # Real impl would use datetime
-        arrival_time = "10:00 AM" # Placeholder
+        # Arrival = previous departure + transit, waiting for the store to open if early
+        clock = max(clock + transit["duration_min"], parse_hhmm(store.hours.open, 0))
+        arrival_time = format_clock(clock)
+        clock += shopping_time
         
         steps.append(RouteStep(
             order=idx + 1,
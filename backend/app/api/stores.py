@@ -1,22 +1,33 @@
 import os
-import httpx
+import json
+import asyncio
 import urllib.parse
-from typing import List, Optional
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException, Query
-# Keep Store model import for compatibility with stubbed endpoints, though search returns different shape or we map it
+from fastapi.responses import StreamingResponse
 from app.models.store import Store 
+from app.services.store_catalog import store_catalog
+from app.services.brand_index import brand_index
+from app.utils.geo import walk_minutes
+from app.utils.http_client import http_clients
+from app.utils.rate_limiter import naver_limiter
+from app.utils.cache import get_cache
+from app.utils.singleflight import get_singleflight
 
 router = APIRouter()
 
-# 1. Compatibility Stub
-STORES: List[Store] = []
+# 1. Curated stores: app/data/stores.json, loaded at startup into store_catalog
 
 # 2. Naver API Keys (Reusing Shop Keys as requested)
 NAVER_CLIENT_ID = os.getenv("NAVER_SHOP_CLIENT_ID", "")
 NAVER_CLIENT_SECRET = os.getenv("NAVER_SHOP_CLIENT_SECRET", "")
 NAVER_LOCAL_URL = "https://openapi.naver.com/v1/search/local.json"
 
+SEOUL_TZ = ZoneInfo("Asia/Seoul")
+
 # 3. Models for Search
 class StoreSearchRequest(BaseModel):
     brands: List[str]
@@ -58,85 +69,218 @@ def _convert_coord(val: str) -> float:
     except Exception:
         return 0.0
 
-# 5. Search Endpoint
-@router.post("/search", response_model=StoreSearchResponse)
-async def search_stores(request: StoreSearchRequest):
-    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
-        raise HTTPException(status_code=500, detail="Naver API Keys not configured")
+# 5. Per-brand search (cached per (brand, area), coalesced, rate-limited)
+STORE_SEARCH_TTL = int(os.getenv("STORE_SEARCH_TTL", "21600"))  # 6 hours
+_brand_cache = get_cache("store_search", max_entries=2000, max_bytes=8 * 1024 * 1024, default_ttl=STORE_SEARCH_TTL)
+_brand_flight = get_singleflight("store_search")
+
 
+async def _fetch_brand_stores(brand: str, area: Optional[str], cache_key: str) -> List[StoreSearchResult]:
     headers = {
         "X-Naver-Client-Id": NAVER_CLIENT_ID,
         "X-Naver-Client-Secret": NAVER_CLIENT_SECRET,
     }
+    query = f"{brand} {area}" if area else f"{brand} 서울"
+    params = {
+        "query": query,
+        "display": 3, # Reduced to 3 per brand as requested to avoid clutter
+        "sort": "random"
+    }
+
+    client = http_clients.get(NAVER_LOCAL_URL)
+    try:
+        # Shared token bucket (same Naver app key as shopping search)
+        await naver_limiter.acquire()
+        resp = await client.get(NAVER_LOCAL_URL, headers=headers, params=params)
+        
+        if resp.status_code == 429:
+            print(f"Rate limit hit for {brand}, retrying...")
+            naver_limiter.pause(1.0)
+            await naver_limiter.acquire()
+            resp = await client.get(NAVER_LOCAL_URL, headers=headers, params=params)
+
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        # Errors are not cached, so the next request retries
+        print(f"Error searching {brand}: {e}")
+        return []
+
+    stores = []
+    for item in data.get("items", []):
+        # Clean tags like <b>...</b>
+        name_clean = item['title'].replace("<b>", "").replace("</b>", "")
+        
+        # Coordinates
+        lat = _convert_coord(item['mapy'])
+        lng = _convert_coord(item['mapx'])
+        
+        if lat == 0 or lng == 0:
+            continue
 
-    all_stores = []
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        import asyncio
-        for brand in request.brands:
-            query = f"{brand} {request.area}" if request.area else f"{brand} 서울"
-            
-            try:
-                # Add delay to avoid rate limits when searching multiple brands
-                if len(request.brands) > 1:
-                    await asyncio.sleep(0.15)
-
-                params = {
-                    "query": query,
-                    "display": 3, # Reduced to 3 per brand as requested to avoid clutter
-                    "sort": "random"
-                }
-                resp = await client.get(NAVER_LOCAL_URL, headers=headers, params=params)
-                
-                if resp.status_code == 429:
-                    print(f"Rate limit hit for {brand}, retrying...")
-                    await asyncio.sleep(1.0)
-                    resp = await client.get(NAVER_LOCAL_URL, headers=headers, params=params)
-
-                resp.raise_for_status()
-                data = resp.json()
-                
-                for item in data.get("items", []):
-                    # Clean tags like <b>...</b>
-                    name_clean = item['title'].replace("<b>", "").replace("</b>", "")
-                    
-                    # Coordinates
-                    lat = _convert_coord(item['mapy'])
-                    lng = _convert_coord(item['mapx'])
-                    
-                    if lat == 0 or lng == 0:
-                        continue
-
-                    # Links
-                    naver_link = f"https://map.naver.com/v5/search/{urllib.parse.quote(name_clean)}"
-                    kakao_link = f"https://map.kakao.com/link/search/{urllib.parse.quote(name_clean)}"
-
-                    all_stores.append(StoreSearchResult(
-                        name=name_clean,
-                        brand=brand, # Tag with original brand name
-                        category=item.get('category', ''),
-                        address=item.get('address', ''),
-                        roadAddress=item.get('roadAddress', ''),
-                        lat=lat,
-                        lng=lng,
-                        naverLink=naver_link,
-                        kakaoLink=kakao_link
-                    ))
-            except Exception as e:
-                print(f"Error searching {brand}: {e}")
+        # Links
+        naver_link = f"https://map.naver.com/v5/search/{urllib.parse.quote(name_clean)}"
+        kakao_link = f"https://map.kakao.com/link/search/{urllib.parse.quote(name_clean)}"
+
+        stores.append(StoreSearchResult(
+            name=name_clean,
+            brand=brand, # Tag with original brand name
+            category=item.get('category', ''),
+            address=item.get('address', ''),
+            roadAddress=item.get('roadAddress', ''),
+            lat=lat,
+            lng=lng,
+            naverLink=naver_link,
+            kakaoLink=kakao_link
+        ))
+
+    _brand_cache.set(cache_key, stores)
+    # 추천 결과의 matching_stores에서 재사용
+    brand_index.add_search_results(brand, [(s.name, s.lat, s.lng) for s in stores])
+    return stores
+
+
+async def _search_brand(brand: str, area: Optional[str]) -> List[StoreSearchResult]:
+    cache_key = f"{brand}|{area or ''}".lower().strip()
+    cached = _brand_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    return await _brand_flight.do(cache_key, lambda: _fetch_brand_stores(brand, area, cache_key))
+
+
+class _StoreDeduper:
+    """Drops results already seen by name or by (~10m rounded) coordinate."""
+
+    def __init__(self):
+        self._names = set()
+        self._coords = set()
+
+    def filter(self, stores: List[StoreSearchResult]) -> List[StoreSearchResult]:
+        unique = []
+        for store in stores:
+            name_key = store.name.replace(" ", "").lower()
+            coord_key = (round(store.lat, 4), round(store.lng, 4))
+            if name_key in self._names or coord_key in self._coords:
                 continue
+            self._names.add(name_key)
+            self._coords.add(coord_key)
+            unique.append(store)
+        return unique
+
+
+def _check_naver_keys() -> None:
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        raise HTTPException(status_code=500, detail="Naver API Keys not configured")
+
+
+# 6. Search Endpoints
+@router.post("/search", response_model=StoreSearchResponse)
+async def search_stores(request: StoreSearchRequest):
+    _check_naver_keys()
 
+    # All brands fan out at once; the shared token bucket paces the actual API calls
+    results = await asyncio.gather(*[_search_brand(brand, request.area) for brand in request.brands])
+
+    deduper = _StoreDeduper()
+    all_stores = [store for stores in results for store in deduper.filter(stores)]
     return StoreSearchResponse(stores=all_stores)
 
-# 6. Legacy Stubs
+
+@router.post("/search/stream")
+async def search_stores_stream(request: StoreSearchRequest):
+    """
+    Same search as /search, streamed as NDJSON so the map can drop pins as each brand resolves.
+    One line per brand: {"brand": ..., "stores": [...]}, then a final {"done": true, "total": n}.
+    """
+    _check_naver_keys()
+
+    async def _lines():
+        deduper = _StoreDeduper()
+        total = 0
+
+        async def _tagged(brand: str):
+            return brand, await _search_brand(brand, request.area)
+
+        for next_done in asyncio.as_completed([_tagged(brand) for brand in request.brands]):
+            brand, stores = await next_done
+            unique = deduper.filter(stores)
+            total += len(unique)
+            yield json.dumps(
+                {"brand": brand, "stores": [s.model_dump() for s in unique]},
+                ensure_ascii=False,
+            ) + "\n"
+
+        yield json.dumps({"done": True, "total": total}) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+# 7. Curated Store Catalog
 @router.get("/", response_model=List[Store])
 async def get_stores():
-    return []
+    return store_catalog.stores()
 
 @router.get("/nearby", response_model=List[Store])
-async def get_nearby_stores():
-    return []
+async def get_nearby_stores(
+    lat: float = Query(...),
+    lng: float = Query(...),
+    radius_km: Optional[float] = Query(None, gt=0),
+    k: Optional[int] = Query(None, gt=0),
+):
+    if radius_km is None and k is None:
+        radius_km = 2.0
+    results = store_catalog.nearby(lat, lng, radius_km=radius_km, k=k)
+    return [
+        store.model_copy(update={"walk_minutes": walk_minutes(distance)})
+        for store, distance in results
+    ]
+
+@router.get("/query", response_model=List[Store])
+async def query_stores(
+    lat: Optional[float] = Query(None),
+    lng: Optional[float] = Query(None),
+    radius_km: Optional[float] = Query(None, gt=0),
+    area: Optional[str] = Query(None),
+    style_tags: List[str] = Query([]),
+    style_match: Literal["any", "all"] = Query("any"),
+    features: List[str] = Query([]),
+    budget_min: Optional[int] = Query(None, ge=0),
+    budget_max: Optional[int] = Query(None, ge=0),
+    open_now: bool = Query(False),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    sort: Literal["score", "distance", "rating"] = Query("score"),
+    k: int = Query(20, gt=0, le=100),
+):
+    """
+    Filter and rank the curated catalog (e.g. ?style_tags=casual&features=tax-refund&open_now=true).
+    Filters run as array masks over the whole catalog; only the top `k` are returned.
+    """
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if lat is None and (radius_km is not None or sort == "distance"):
+        raise HTTPException(status_code=400, detail="radius_km and sort=distance require lat/lng")
+
+    open_at = None
+    if open_now:
+        now = datetime.now(SEOUL_TZ)
+        open_at = (now.weekday(), now.hour * 60 + now.minute)
+
+    result = store_catalog.query(
+        lat=lat, lng=lng, radius_km=radius_km, area=area,
+        style_tags=style_tags, style_match=style_match, features=features,
+        budget_min=budget_min, budget_max=budget_max, open_at=open_at,
+        min_rating=min_rating, sort=sort, k=k,
+    )
+    stores = store_catalog.stores(result.rows)
+    if result.distances_km is None:
+        return stores
+    return [
+        store.model_copy(update={"walk_minutes": walk_minutes(float(distance))})
+        for store, distance in zip(stores, result.distances_km)
+    ]
 
 @router.get("/{store_id}", response_model=Store)
 async def get_store_detail(store_id: str):
-    raise HTTPException(status_code=404, detail="Store not found (Legacy)")
+    store = store_catalog.get(store_id)
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+    return store
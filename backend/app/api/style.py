@@ -1,8 +1,14 @@
+import json
+import logging
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from app.services.weather_service import weather_service
 from app.services.openai_service import openai_service
+from app.services.style_warmer import style_warmer
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -24,15 +30,29 @@ class StyleAdjustmentRequest(BaseModel):
     language: str = "en"
 
 
+def _style_sources(request: StyleRequest) -> List[str]:
+    # Merge all possible style sources
+    return request.styles + request.style_prefs + request.keywords
+
+
+def _record_combination(request: StyleRequest) -> None:
+    # 자주 요청되는 조합을 백그라운드 워머가 우선 생성
+    style_warmer.record(
+        _style_sources(request), request.budget, request.occasion,
+        request.colors, request.gender, request.language,
+    )
+
+
 @router.post("/recommend")
 async def recommend_style(request: StyleRequest):
     print(f"[style] Received gender: {request.gender}")
     print(f"[style] Received styles: {request.styles}")
     weather = await weather_service.get_seoul_weather()
+    _record_combination(request)
 
     try:
         recommendation = await openai_service.recommend_style(
-            style_prefs=request.styles + request.style_prefs + request.keywords, # Merge all possible style sources
+            style_prefs=_style_sources(request),
             budget=request.budget,
             occasion=request.occasion,
             colors=request.colors,
@@ -46,6 +66,45 @@ async def recommend_style(request: StyleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/recommend/stream")
+async def recommend_style_stream(request: StyleRequest):
+    """
+    Server-sent events version of /recommend. Events:
+    - trend_analysis: the trend_analysis object
+    - outfit: one outfit, as soon as GPT finishes writing it
+    - result: the full response (same body as /recommend)
+    - error: {"detail": ...} if generation fails midway
+    """
+    weather = await weather_service.get_seoul_weather()
+    _record_combination(request)
+
+    async def _events():
+        try:
+            async for event, data in openai_service.recommend_style_stream(
+                style_prefs=_style_sources(request),
+                budget=request.budget,
+                occasion=request.occasion,
+                colors=request.colors,
+                gender=request.gender,
+                weather=weather,
+                language=request.language
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            logger.error(f"Streaming recommendation failed: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/adjust")
 async def adjust_style(request: StyleAdjustmentRequest):
     try:
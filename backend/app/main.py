@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -6,8 +7,49 @@ import os
 load_dotenv()
 
 from app.api import style, fitting, stores, route, placeholder, ootd
+from app.services.store_catalog import store_catalog
+from app.services.brand_index import brand_index
+from app.services.odsay_service import odsay_service
+from app.utils.http_client import http_clients
+from app.utils.cache import start_sweeper, stop_sweeper, cache_stats
+from app.utils.singleflight import singleflight_stats
+from app.utils import persistent_cache
+from app.utils.rate_limiter import rate_limiter_stats
+from app.services.style_cache import style_cache
+from app.utils.llm_usage import llm_usage
+from app.services.openai_service import openai_service
+from app.services.style_warmer import style_warmer, STYLE_WARM_ENABLED
+from app.services.fitting_jobs import fitting_jobs
+from app.utils.bounded_executor import gemini_executor
+from app.services.tryon_cache import tryon_cache
+from app.utils.image_prep import image_preprocessor
 
-app = FastAPI(title="K-Fit API", version="0.5.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: 매장 데이터 로드, 커넥션 풀 준비, 캐시 정리 작업 시작
+    store_catalog.load()
+    brand_index.build(store_catalog)
+    odsay_service.load_transit_matrix()
+    http_clients.start()
+    start_sweeper()
+    persistent_cache.start_purger()
+    if STYLE_WARM_ENABLED:
+        style_warmer.start()
+    await fitting_jobs.start()
+    yield
+    # Shutdown: 백그라운드 작업 및 커넥션 정리
+    await fitting_jobs.stop()
+    await style_warmer.stop()
+    await stop_sweeper()
+    await persistent_cache.stop_purger()
+    await http_clients.aclose()
+    gemini_executor.shutdown()
+    image_preprocessor.shutdown()
+    persistent_cache.close()
+
+
+app = FastAPI(title="K-Fit API", version="0.5.0", lifespan=lifespan)
 
 origins = ["*"]
 
@@ -29,3 +71,26 @@ app.include_router(ootd.router, prefix="/api/ootd", tags=["ootd"])
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok", "version": "0.5.0"}
+
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "http": http_clients.stats(),
+        "cache": cache_stats(),
+        "singleflight": singleflight_stats(),
+        "persistent_cache": persistent_cache.persistent_cache_stats(),
+        "rate_limit": rate_limiter_stats(),
+        "style_cache": style_cache.stats(),
+        "style_warmer": style_warmer.stats(),
+        "llm": llm_usage.report(),
+        "llm_router": openai_service.router.stats(),
+        "fitting_jobs": fitting_jobs.stats(),
+        "gemini_executor": gemini_executor.stats(),
+        "tryon_cache": tryon_cache.stats(),
+        "image_prep": image_preprocessor.stats(),
+    }
+
+@app.get("/api/metrics/llm")
+async def llm_metrics():
+    """Tokens per request and latency percentiles per LLM-calling endpoint."""
+    return llm_usage.report()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 
 class FittingRequest(BaseModel):
     user_image: str  # base64
@@ -9,3 +9,15 @@ class FittingRequest(BaseModel):
 class FittingResponse(BaseModel):
     generated_image: str # base64
     processing_time: float
+    stage_timings: Optional[Dict[str, float]] = None # seconds per stage (image_prep, image_fetch, image_search, image_download, generation)
+    cached: bool = False # served from the try-on result cache
+
+class FittingJob(BaseModel):
+    job_id: str
+    status: str # queued, running, done, failed
+    stage: Optional[str] = None # image_fetch, generation (while running)
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[FittingResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
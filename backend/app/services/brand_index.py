@@ -0,0 +1,118 @@
+"""
+Brand → store inverted index for outfit recommendations.
+
+Built from the curated catalog at startup (every word-prefix of a store's English and
+Korean name, e.g. "MUSINSA Standard Hongdae" → "musinsa", "musinsastandard", ...) and
+topped up with stores found by `/api/stores/search`, so `recommend_style` can fill each
+outfit's `matching_stores` in-process instead of the client searching Naver per brand.
+"""
+import re
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.style import StoreInfo
+
+logger = logging.getLogger(__name__)
+
+# 브랜드당 보관할 네이버 검색 결과 수
+MAX_SEARCH_RESULTS_PER_BRAND = 5
+
+_PAREN = re.compile(r"\(([^)]*)\)")
+_NON_WORD = re.compile(r"[^0-9a-z가-힣]+")
+
+
+def normalize_brand(value: str) -> str:
+    """'MUSINSA Standard' -> 'musinsastandard', 'H&M' -> 'hm'"""
+    return _NON_WORD.sub("", (value or "").lower())
+
+
+def _brand_keys(value: str) -> List[str]:
+    """Lookup keys for an outfit item's brand: 'Bukchonzalak (북촌잘락)' -> ['bukchonzalak', '북촌잘락']."""
+    keys = []
+    for part in [_PAREN.sub(" ", value or "")] + _PAREN.findall(value or ""):
+        key = normalize_brand(part)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _name_prefixes(name: str) -> Iterable[str]:
+    words = [w for w in (normalize_brand(w) for w in name.split()) if w]
+    for i in range(1, len(words) + 1):
+        yield "".join(words[:i])
+
+
+class BrandStoreIndex:
+    def __init__(self):
+        self._curated: Dict[str, List[StoreInfo]] = {}
+        self._searched: Dict[str, List[StoreInfo]] = {}
+
+    def build(self, catalog) -> None:
+        """Index a loaded app.services.store_catalog.StoreCatalog."""
+        index: Dict[str, List[StoreInfo]] = {}
+        for store in catalog.stores():
+            info = StoreInfo(
+                store_id=store.id,
+                store_name=store.name.en,
+                area=store.area,
+                lat=store.location.lat,
+                lng=store.location.lng,
+            )
+            keys = set(_name_prefixes(store.name.en)) | set(_name_prefixes(store.name.ko))
+            for key in keys:
+                index.setdefault(key, []).append(info)
+        self._curated = index
+        logger.info(f"Brand index built: {len(index)} keys over {len(catalog)} stores")
+
+    def add_search_results(self, brand: str, results: Iterable[Tuple[str, float, float]]) -> None:
+        """Remember (name, lat, lng) stores found by a Naver local search for `brand`."""
+        key = normalize_brand(brand)
+        if not key:
+            return
+        infos = []
+        for name, lat, lng in results:
+            infos.append(StoreInfo(
+                store_id=f"naver_{lat:.5f}_{lng:.5f}",
+                store_name=name,
+                lat=lat,
+                lng=lng,
+            ))
+            if len(infos) >= MAX_SEARCH_RESULTS_PER_BRAND:
+                break
+        if infos:
+            self._searched[key] = infos
+
+    def lookup(self, brand: str) -> List[StoreInfo]:
+        """Curated stores for `brand`, or cached search results if there are none."""
+        for key in _brand_keys(brand):
+            stores = self._curated.get(key) or self._searched.get(key)
+            if stores:
+                return stores
+        return []
+
+    def match_outfit(self, outfit: dict, limit: Optional[int] = None) -> List[StoreInfo]:
+        """
+        Stores carrying the brands of an outfit's items, without duplicates. Every brand's
+        first store comes before any brand's second, so a small `limit` still covers each brand.
+        """
+        per_item: List[List[StoreInfo]] = []
+        for item in outfit.get("items", []):
+            store_id = item.get("store_id") or ""
+            candidates = self.lookup(item.get("store_name") or "")
+            if not candidates and store_id.startswith("brand_"):
+                candidates = self.lookup(store_id[len("brand_"):])
+            per_item.append(candidates)
+
+        matched: List[StoreInfo] = []
+        seen = set()
+        for rank in range(max((len(c) for c in per_item), default=0)):
+            for candidates in per_item:
+                if rank >= len(candidates) or candidates[rank].store_id in seen:
+                    continue
+                seen.add(candidates[rank].store_id)
+                matched.append(candidates[rank])
+                if limit is not None and len(matched) >= limit:
+                    return matched
+        return matched
+
+
+brand_index = BrandStoreIndex()
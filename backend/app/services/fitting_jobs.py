@@ -0,0 +1,364 @@
+"""
+Background job queue for virtual try-on.
+
+`submit()` stores the request in a local SQLite job store and returns a job id at once;
+a bounded pool of workers claims queued jobs and runs `FittingService.process_fitting`,
+recording the current stage (image_fetch → generation) and finally the result or error.
+Clients poll `/api/fitting/jobs/{id}`, read `/result`, follow `/events` (SSE), or pass a
+`callback_url` that receives the finished job as a POST. Callback URLs must be https and
+resolve to public addresses (or match FITTING_CALLBACK_ALLOWED_HOSTS when set); they are
+checked on submit and again right before the POST, which uses a one-shot client.
+
+Jobs are claimed with a conditional UPDATE, so several uvicorn workers can share one store,
+and jobs left queued or stuck running by a restart are picked up again. The uploaded image
+is dropped from the row once the job finishes; finished jobs expire after FITTING_JOB_TTL.
+Rows carry multi-MB base64 images, so every store call runs on the job DB's own thread.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import ipaddress
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from app.utils.persistent_cache import CACHE_DIR, _Database
+from app.utils.image_prep import InvalidImageError
+
+logger = logging.getLogger(__name__)
+
+FITTING_JOB_WORKERS = int(os.getenv("FITTING_JOB_WORKERS", "2"))
+FITTING_JOB_QUEUE_MAX = int(os.getenv("FITTING_JOB_QUEUE_MAX", "50"))
+FITTING_JOB_TTL = int(os.getenv("FITTING_JOB_TTL", "3600"))
+# running 상태로 이 시간 동안 갱신이 없으면 (프로세스 종료 등) 다시 대기열로
+FITTING_JOB_STALE_SEC = int(os.getenv("FITTING_JOB_STALE_SEC", "300"))
+# 다른 프로세스가 등록한 작업을 발견하기 위한 폴링 주기
+POLL_INTERVAL_SEC = 2.0
+# 만료 작업 삭제 / 멈춘 작업 재등록 주기
+RECOVER_INTERVAL_SEC = float(os.getenv("FITTING_JOB_RECOVER_INTERVAL", "60"))
+# 설정 시 이 호스트로만 콜백 전송 (쉼표 구분), 미설정 시 공인 IP로 해석되는 https 호스트만
+FITTING_CALLBACK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("FITTING_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+CALLBACK_TIMEOUT_SEC = float(os.getenv("FITTING_CALLBACK_TIMEOUT", "10"))
+
+JOBS_DB_PATH = CACHE_DIR / "fitting_jobs.sqlite3"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL = (DONE, FAILED)
+# 실패 사유 코드 (API에서 상태 코드로 변환)
+ERROR_RATE_LIMITED, ERROR_INVALID_IMAGE = "rate_limited", "invalid_image"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fitting_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress TEXT,
+    request TEXT,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS fitting_jobs_status ON fitting_jobs (status, created_at);
+"""
+
+_COLUMNS = "id, status, stage, progress, result, error, created_at, updated_at"
+
+
+class QueueFullError(Exception):
+    """Too many try-on jobs are already waiting."""
+
+
+class CallbackURLError(ValueError):
+    """The callback URL is not an allowed https endpoint."""
+
+
+async def validate_callback_url(url: str) -> None:
+    """Raise CallbackURLError unless `url` is https and its host is allowed / resolves only to public IPs."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host:
+        raise CallbackURLError("callback_url must be an https URL")
+    if FITTING_CALLBACK_ALLOWED_HOSTS:
+        if host not in FITTING_CALLBACK_ALLOWED_HOSTS:
+            raise CallbackURLError(f"callback host {host} is not allowed")
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parts.port or 443, proto=6)
+    except OSError:
+        raise CallbackURLError(f"callback host {host} does not resolve")
+    for info in infos:
+        # 루프백, 사설망, 링크 로컬(메타데이터 서버 포함), 예약 대역 등은 거절
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise CallbackURLError(f"callback host {host} resolves to a non-public address")
+
+
+def _job_from_row(row) -> Dict[str, Any]:
+    job_id, status, stage, progress, result, error, created_at, updated_at = row
+    return {
+        "job_id": job_id,
+        "status": status,
+        "stage": stage,
+        "progress": json.loads(progress) if progress else None,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+class FittingJobQueue:
+    def __init__(self, db: _Database, workers: int = FITTING_JOB_WORKERS, max_queued: int = FITTING_JOB_QUEUE_MAX, service=None):
+        self._db = db
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self._service = service
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        # job id → 상태 변경 알림 (이 프로세스에서 처리 중인 작업만)
+        self._changed: Dict[str, asyncio.Event] = {}
+        # metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.recovered = 0
+        # 마지막으로 확인한 대기 작업 수 (/api/metrics에서 DB를 조회하지 않도록)
+        self.queued: Optional[int] = None
+        self.queue_wait_total = 0.0
+        self.run_time_total = 0.0
+        self.purged = 0
+        self._last_recover = 0.0
+
+    @property
+    def service(self):
+        if self._service is None:
+            from app.services.fitting_service import fitting_service
+            self._service = fitting_service
+        return self._service
+
+    # --- store ---
+    # 결과 행은 수 MB의 base64 JSON이므로 SQLite 호출과 JSON 처리는 모두 DB 전용 스레드에서
+
+    def _get_sync(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._db.execute(
+            f"SELECT {_COLUMNS} FROM fitting_jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (job_id, time.time()),
+        )
+        return _job_from_row(rows[0]) if rows else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._db.run(self._get_sync, job_id)
+
+    def _queued_count_sync(self) -> int:
+        self.queued = self._db.execute("SELECT COUNT(*) FROM fitting_jobs WHERE status = ?", (QUEUED,))[0][0]
+        return self.queued
+
+    def _update_sync(self, job_id: str, fields: Dict[str, Any]) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._db.modify(f"UPDATE fitting_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        await self._db.run(self._update_sync, job_id, fields)
+        event = self._changed.get(job_id)
+        if event is not None:
+            event.set()
+
+    def _submit_sync(self, request: Dict[str, Any], callback_url: Optional[str]) -> Optional[Dict[str, Any]]:
+        if self._queued_count_sync() >= self.max_queued:
+            return None
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._db.modify(
+            "INSERT INTO fitting_jobs (id, status, request, callback_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(request, ensure_ascii=False), callback_url, now, now),
+        )
+        self.queued += 1
+        return self._get_sync(job_id)
+
+    async def submit(self, user_image: str, outfit_items: List[Dict[str, Any]], language: str, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        request = {"user_image": user_image, "outfit_items": outfit_items, "language": language}
+        job = await self._db.run(self._submit_sync, request, callback_url)
+        if job is None:
+            self.rejected += 1
+            raise QueueFullError(f"{self.max_queued} try-on jobs already queued")
+        self.submitted += 1
+        self._wakeup.set()
+        return job
+
+    def _claim(self) -> Optional[tuple]:
+        """Atomically take the oldest queued job; (id, request, callback_url, created_at) or None."""
+        while True:
+            rows = self._db.execute(
+                "SELECT id, request, callback_url, created_at FROM fitting_jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            )
+            if not rows:
+                self.queued = 0
+                return None
+            changed = self._db.modify(
+                "UPDATE fitting_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), rows[0][0], QUEUED),
+            )
+            if changed:
+                self._queued_count_sync()
+                return rows[0]
+            # 다른 워커가 먼저 가져감 → 다음 작업
+
+    def recover(self) -> None:
+        """Requeue jobs whose worker stopped mid-run and drop expired finished jobs."""
+        now = time.time()
+        self.recovered += self._db.modify(
+            "UPDATE fitting_jobs SET status = ?, stage = NULL, progress = NULL, updated_at = ? "
+            "WHERE status = ? AND updated_at < ? AND request IS NOT NULL",
+            (QUEUED, now, RUNNING, now - FITTING_JOB_STALE_SEC),
+        )
+        self.purged += self._db.modify("DELETE FROM fitting_jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+
+    async def _maybe_recover(self) -> None:
+        """Run recover() at most every RECOVER_INTERVAL_SEC while the workers are up."""
+        now = time.monotonic()
+        if now - self._last_recover < RECOVER_INTERVAL_SEC:
+            return
+        # 다른 워커가 동시에 실행하지 않도록 먼저 기록
+        self._last_recover = now
+        try:
+            await self._db.run(self.recover)
+        except sqlite3.Error as e:
+            logger.warning(f"[fitting_jobs] recovery failed: {e}")
+
+    # --- workers ---
+
+    async def _run(self, job_id: str, request: Dict[str, Any], callback_url: Optional[str], created_at: float) -> None:
+        started = time.time()
+        self.queue_wait_total += started - created_at
+        self._changed.setdefault(job_id, asyncio.Event())
+
+        async def _on_stage(stage: str, progress: Dict[str, Any]) -> None:
+            await self._update(job_id, stage=stage, progress=json.dumps(progress))
+
+        try:
+            response = await self.service.process_fitting(
+                user_image=request["user_image"],
+                outfit_items=request["outfit_items"],
+                language=request["language"],
+                on_stage=_on_stage,
+                # 작업은 이미 대기열을 거쳤으므로 Gemini 풀이 가득 차도 거절하지 않고 기다림
+                admission=False,
+            )
+            await self._update(
+                job_id, status=DONE, result=response.model_dump_json(), request=None,
+                expires_at=time.time() + FITTING_JOB_TTL,
+            )
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"[fitting_jobs] {job_id} failed: {e}")
+            error = ERROR_INVALID_IMAGE if isinstance(e, InvalidImageError) else str(e)
+            await self._update(job_id, status=FAILED, error=error, request=None, expires_at=time.time() + FITTING_JOB_TTL)
+            self.failed += 1
+        finally:
+            self.run_time_total += time.time() - started
+            self._changed.pop(job_id, None)
+
+        if callback_url:
+            await self._notify(callback_url, await self.get(job_id))
+
+    async def _notify(self, url: str, job: Dict[str, Any]) -> None:
+        try:
+            # 제출 후 DNS가 바뀌었을 수 있으므로 전송 직전에 다시 확인
+            await validate_callback_url(url)
+            # 공유 레지스트리에 클라이언트를 남기지 않도록 일회용 클라이언트 사용, 리다이렉트는 따르지 않음
+            async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT_SEC, follow_redirects=False) as client:
+                resp = await client.post(url, json=job)
+            if resp.status_code >= 400:
+                logger.warning(f"[fitting_jobs] callback {url} returned {resp.status_code}")
+        except Exception as e:
+            logger.warning(f"[fitting_jobs] callback {url} failed: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            await self._maybe_recover()
+            try:
+                claimed = await self._db.run(self._claim)
+            except sqlite3.Error as e:
+                logger.warning(f"[fitting_jobs] claim failed: {e}")
+                claimed = None
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, request, callback_url, created_at = claimed
+            await self._run(job_id, json.loads(request), callback_url, created_at)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._last_recover = 0.0
+        await self._maybe_recover()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._db.close()
+
+    # --- progress ---
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job each time its status or stage changes, ending with the finished job."""
+        last = None
+        while True:
+            # 이 프로세스가 처리 중이면 변경 즉시, 아니면 1초마다 확인
+            event = self._changed.get(job_id)
+            if event is not None:
+                event.clear()
+            job = await self.get(job_id)
+            if job is None:
+                return
+            marker = (job["status"], job["stage"])
+            if marker != last:
+                last = marker
+                yield job
+            if job["status"] in TERMINAL:
+                return
+            if event is None:
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": len(self._tasks),
+            "queued": self.queued,
+            "running": len(self._changed),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "recovered": self.recovered,
+            "purged": self.purged,
+            "avg_queue_wait_sec": round(self.queue_wait_total / finished, 3) if finished else 0.0,
+            "avg_run_sec": round(self.run_time_total / finished, 3) if finished else 0.0,
+        }
+
+
+fitting_jobs = FittingJobQueue(_Database(JOBS_DB_PATH, _SCHEMA))
@@ -1,26 +1,35 @@
+import os
+import asyncio
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Union
 from app.services.gemini_service import gemini_service
 from app.models.fitting import FittingResponse
+from app.utils.http_client import http_clients
+from app.utils.bounded_executor import gemini_executor
+from app.utils.image_prep import prepare_image, verify_image, TRYON_MAX_EDGE, PRODUCT_MAX_EDGE
+from app.services.tryon_cache import tryon_cache, user_image_hash, request_key, content_key
 
 logger = logging.getLogger(__name__)
 
+# 상품 이미지 검색+다운로드 동시 실행 수 / 아이템별 제한 시간
+FETCH_CONCURRENCY = int(os.getenv("FITTING_FETCH_CONCURRENCY", "4"))
+ITEM_DEADLINE_SEC = float(os.getenv("FITTING_ITEM_DEADLINE_SEC", "10"))
+
 class FittingService:
     async def _download_image_as_bytes(self, url: str) -> bytes | None:
         """URL에서 이미지를 다운로드해서 bytes로 반환 (User-Agent 추가)"""
-        import httpx
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
             "Referer": "https://shopping.naver.com/"
         }
         try:
-            async with httpx.AsyncClient(follow_redirects=True, timeout=15) as client:
-                resp = await client.get(url, headers=headers)
-                if resp.status_code == 200:
-                    return resp.content
-                else:
-                    print(f"[fitting] Download failed with status {resp.status_code} for {url}")
+            client = http_clients.get(url)
+            resp = await client.get(url, headers=headers)
+            if resp.status_code == 200:
+                return resp.content
+            else:
+                print(f"[fitting] Download failed with status {resp.status_code} for {url}")
         except Exception as e:
             print(f"[fitting] Image download error: {e}")
         return None
@@ -40,60 +49,168 @@ class FittingService:
         
         return None
 
-    async def process_fitting(self, user_image: str, outfit_items: List[Dict[str, Any]], language: str) -> FittingResponse:
-        import asyncio
-        start_time = time.time()
-        
-        # 1. Fetch Product Images
-        print(f"[fitting] Starting image fetch for {len(outfit_items)} items")
-        product_images = []
-        for item in outfit_items:
+    async def _fetch_product_image(self, item: Dict[str, Any], semaphore: asyncio.Semaphore, timings: Dict[str, float]) -> Dict[str, Any] | None:
+        """검색 → 다운로드 (semaphore로 동시 실행 수 제한). 단계별 소요 시간은 timings에 최대값으로 기록"""
+        item_name = item.get("name", "")
+        brand = item.get("store_name", "") or item.get("brand", "")
+
+        async with semaphore:
+            print(f"[fitting] Fetching product image for: {brand} - {item_name}")
+            search_start = time.perf_counter()
+            img_url = await self._get_product_image_url(item_name, brand)
+            search_time = time.perf_counter() - search_start
+            timings["image_search"] = max(timings.get("image_search", 0.0), search_time)
+
+            if not img_url:
+                print(f"[fitting] No image URL found for {item_name}")
+                return None
+
+            download_start = time.perf_counter()
+            img_bytes = await self._download_image_as_bytes(img_url)
+            download_time = time.perf_counter() - download_start
+            timings["image_download"] = max(timings.get("image_download", 0.0), download_time)
+
+        if not img_bytes:
+            return None
+
+        size_kb = len(img_bytes) / 1024
+        print(f"[fitting] Downloaded {item_name} image: {size_kb:.1f}KB")
+        try:
+            prepared = await prepare_image(img_bytes, max_edge=PRODUCT_MAX_EDGE)
+        except ValueError:
+            print(f"[fitting] Downloaded file for {item_name} is not an image, skipping")
+            return None
+        return {
+            "name": item_name,
+            "bytes": prepared.data,
+            "mime_type": prepared.mime_type
+        }
+
+    async def _fetch_product_images(self, outfit_items: List[Dict[str, Any]], timings: Dict[str, float]) -> List[Dict[str, Any]]:
+        """모든 아이템의 상품 이미지를 동시에 가져옴. 실패/시간 초과 아이템은 건너뜀 (순서 유지)"""
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+        async def _with_deadline(item: Dict[str, Any]) -> Dict[str, Any] | None:
             try:
-                item_name = item.get("name", "")
-                brand = item.get("store_name", "") or item.get("brand", "")
-                
-                print(f"[fitting] Fetching product image for: {brand} - {item_name}")
-                img_url = await self._get_product_image_url(item_name, brand)
-                if img_url:
-                    img_bytes = await self._download_image_as_bytes(img_url)
-                    if img_bytes:
-                        size_kb = len(img_bytes) / 1024
-                        print(f"[fitting] Downloaded {item_name} image: {size_kb:.1f}KB")
-                        product_images.append({
-                            "name": item_name,
-                            "bytes": img_bytes,
-                            "mime_type": "image/jpeg"
-                        })
-                else:
-                    print(f"[fitting] No image URL found for {item_name}")
+                return await asyncio.wait_for(
+                    self._fetch_product_image(item, semaphore, timings),
+                    timeout=ITEM_DEADLINE_SEC,
+                )
+            except asyncio.TimeoutError:
+                print(f"[fitting] Product image fetch timed out for {item.get('name')}")
             except Exception as e:
                 print(f"[fitting] Failed to download product image for {item.get('name')}: {e}")
-                continue
+            return None
+
+        results = await asyncio.gather(*[_with_deadline(item) for item in outfit_items])
+        return [r for r in results if r]
+
+    async def _prepare_user_image(self, user_image: Union[str, bytes], timings: Dict[str, float]):
+        prep_start = time.perf_counter()
+        prepared = await prepare_image(user_image, max_edge=TRYON_MAX_EDGE)
+        timings["image_prep"] = time.perf_counter() - prep_start
+        print(
+            f"[fitting] User photo prepared: {prepared.original_bytes / 1024:.0f}KB → "
+            f"{len(prepared.data) / 1024:.0f}KB ({prepared.width}x{prepared.height})"
+        )
+        return prepared
+
+    def _cached_response(self, generated_image_b64: str, start_time: float) -> FittingResponse:
+        processing_time = time.time() - start_time
+        print(f"[fitting] Served try-on from result cache in {processing_time * 1000:.0f}ms")
+        return FittingResponse(
+            generated_image=generated_image_b64,
+            processing_time=processing_time,
+            stage_timings={"cache": round(processing_time, 3)},
+            cached=True,
+        )
+
+    async def process_fitting(
+        self,
+        user_image: Union[str, bytes],
+        outfit_items: List[Dict[str, Any]],
+        language: str,
+        on_stage: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        admission: bool = True,
+    ) -> FittingResponse:
+        """
+        `user_image` is base64 (JSON endpoints) or raw bytes (upload endpoints).
+        `on_stage(stage, progress)` is awaited as each stage starts (image_fetch, generation).
+        Identical photo + outfit requests are answered from the try-on result cache. With
+        `admission` (interactive requests), a saturated Gemini executor fails fast with
+        ExecutorSaturatedError before any product image is fetched; background jobs pass False
+        and wait for a slot.
+        """
+        start_time = time.time()
+        timings: Dict[str, float] = {}
 
-        print(f"[fitting] Total product images ready: {len(product_images)}")
+        # 0. Result cache: 같은 사진 + 같은 아이템 요청은 검색/다운로드 없이 바로 응답
+        user_hash = user_image_hash(user_image)
+        req_key = request_key(user_hash, outfit_items) if user_hash else None
+        if req_key:
+            cached = await tryon_cache.lookup(req_key)
+            if cached:
+                return self._cached_response(cached, start_time)
+
+        # 이미지가 아닌 사진은 네이버 검색(할당량)을 쓰기 전에 InvalidImageError
+        user_image = await verify_image(user_image)
+        if admission:
+            gemini_executor.check_admission()
+        
+        # 1. Fetch Product Images (concurrently)
+        print(f"[fitting] Starting image fetch for {len(outfit_items)} items")
+        if on_stage:
+            await on_stage("image_fetch", {"items": len(outfit_items)})
+        fetch_start = time.perf_counter()
+        # 상품 이미지 수집은 백그라운드로, 그동안 사용자 사진 전처리(EXIF 회전, 축소, 재인코딩):
+        # 헤더는 정상이지만 디코딩에 실패하면 검색/다운로드를 취소
+        product_task = asyncio.create_task(self._fetch_product_images(outfit_items, timings))
+        try:
+            prepared_user_image = await self._prepare_user_image(user_image, timings)
+        except BaseException:
+            product_task.cancel()
+            raise
+        product_images = await product_task
+        timings["image_fetch"] = time.perf_counter() - fetch_start
+
+        print(f"[fitting] Total product images ready: {len(product_images)}/{len(outfit_items)}")
 
         if not product_images:
             logger.warning("[fitting] No product images downloaded, falling back to text-only")
+
+        # 상품 이미지 기준 키 (브랜드 표기가 달라도 같은 상품 이미지면 적중)
+        cache_key = content_key(user_hash, outfit_items, product_images) if user_hash else None
+        if cache_key:
+            cached = await tryon_cache.get(cache_key)
+            if cached:
+                await tryon_cache.alias(req_key, cache_key)
+                return self._cached_response(cached, start_time)
         
         try:
             # Extract item descriptions
             item_descriptions = [f"{item.get('name')} ({item.get('type')})" for item in outfit_items]
+            if on_stage:
+                await on_stage("generation", {
+                    "items": len(outfit_items),
+                    "product_images": len(product_images),
+                    "image_fetch_sec": round(timings["image_fetch"], 3),
+                })
             
             # Call Gemini Service with Retry Logic
             max_retries = 1
+            generation_start = time.perf_counter()
             for attempt in range(max_retries + 1):
                 try:
-                    # Note: gemini_service calls are synchronous. 
-                    # We run in a thread to keep the loop async and prevent hangups.
-                    loop = asyncio.get_event_loop()
-                    generated_image_b64 = await loop.run_in_executor(
-                        None,
+                    # Note: gemini_service calls are synchronous.
+                    # They run on the dedicated, bounded Gemini pool to keep the loop responsive.
+                    generated_image_b64 = await gemini_executor.run(
                         lambda: gemini_service.virtual_try_on(
-                            user_image, 
+                            prepared_user_image, 
                             item_descriptions, 
                             product_images=product_images,
                             language=language
-                        )
+                        ),
+                        admission=admission,
                     )
                     break # Success
                 except Exception as e:
@@ -109,11 +226,15 @@ class FittingService:
                     
                     raise e
             
+            timings["generation"] = time.perf_counter() - generation_start
+            if cache_key:
+                await tryon_cache.put(cache_key, generated_image_b64, req_key)
             processing_time = time.time() - start_time
             
             return FittingResponse(
                 generated_image=generated_image_b64,
-                processing_time=processing_time
+                processing_time=processing_time,
+                stage_timings={k: round(v, 3) for k, v in timings.items()}
             )
             
         except Exception as e:
@@ -123,22 +244,22 @@ class FittingService:
             print(f"Fitting process failed: {e}")
             raise e
 
-    async def process_style_edit(self, user_image: str, command: str, language: str) -> FittingResponse:
+    async def process_style_edit(self, user_image: Union[str, bytes], command: str, language: str) -> FittingResponse:
         start_time = time.time()
         
         try:
-            import asyncio
-            loop = asyncio.get_event_loop()
-            generated_image_b64 = await loop.run_in_executor(
-                None,
-                lambda: gemini_service.style_edit(user_image, command, language)
+            gemini_executor.check_admission()
+            prepared_user_image = await prepare_image(user_image, max_edge=TRYON_MAX_EDGE)
+            generated_image_b64 = await gemini_executor.run(
+                gemini_service.style_edit, prepared_user_image, command, language
             )
             
             processing_time = time.time() - start_time
             
             return FittingResponse(
                 generated_image=generated_image_b64,
-                processing_time=processing_time
+                processing_time=processing_time,
+                stage_timings={"generation": round(processing_time, 3)}
             )
         except Exception as e:
             logger.error(f"Style edit process failed: {e}")
@@ -5,7 +5,8 @@ import base64
 import logging
 from PIL import Image
 import google.generativeai as genai
-from typing import List, Optional
+from typing import Any, List, Optional, Union
+from app.utils.image_prep import PreparedImage
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +30,25 @@ class GeminiService:
             print(f"Failed to decode base64 image: {e}")
             raise ValueError("Invalid image format")
 
-    def virtual_try_on(self, user_image_b64: str, item_descriptions: List[str], product_images: List[dict] = [], language: str = "en") -> str:
+    def _image_part(self, image: Union[str, PreparedImage]) -> Any:
+        """Preprocessed images go as inline JPEG/WebP blobs; raw base64 is decoded as before."""
+        if isinstance(image, PreparedImage):
+            return image.as_part()
+        return self._decode_image(image)
+
+    def virtual_try_on(self, user_image_b64: Union[str, PreparedImage], item_descriptions: List[str], product_images: List[dict] = [], language: str = "en") -> str:
         """
         Generates a virtual try-on image using Gemini.
         Returns base64 encoded string of the result image.
         
+        user_image_b64: base64 string, or a PreparedImage from utils.image_prep
         product_images: List of dicts with {"name": str, "bytes": bytes, "mime_type": str}
         """
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY is not set")
 
         try:
-            user_image = self._decode_image(user_image_b64)
+            user_image = self._image_part(user_image_b64)
             
             # Construct detailed item descriptions with references
             detailed_descriptions = ""
@@ -141,7 +149,7 @@ Clothing items:
             print(traceback.format_exc())
             raise e
 
-    def style_edit(self, image_b64: str, edit_command: str, language: str) -> str:
+    def style_edit(self, image_b64: Union[str, PreparedImage], edit_command: str, language: str) -> str:
         """
         Edits the user's outfit based on natural language command.
         """
@@ -149,7 +157,7 @@ Clothing items:
             raise ValueError("GOOGLE_API_KEY is not set")
             
         try:
-            user_image = self._decode_image(image_b64)
+            user_image = self._image_part(image_b64)
             
             prompt = f"""
             You are a fashion photo editor.
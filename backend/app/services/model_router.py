@@ -0,0 +1,137 @@
+"""
+Model routing for OpenAI chat calls.
+
+Each task (style_recommend, style_adjust, route_order, ...) starts on a configured tier —
+the small, fast model for short edits and orderings, the large model for full outfit
+generation — and escalates up the tier list when a call misses its deadline or errors, or
+the reply is not valid JSON or fails the caller's schema validation. Tiers, models and
+deadlines are set by env:
+
+    LLM_MODEL_SMALL=gpt-4o-mini   LLM_MODEL_LARGE=gpt-4o
+    LLM_TIER_STYLE_ADJUST=small   LLM_DEADLINE_STYLE_ADJUST=15   (seconds, per attempt)
+"""
+import os
+import json
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.utils.llm_usage import track_llm_call
+
+logger = logging.getLogger(__name__)
+
+TIERS = ["small", "large"]
+
+MODELS = {
+    "small": os.getenv("LLM_MODEL_SMALL", "gpt-4o-mini"),
+    "large": os.getenv("LLM_MODEL_LARGE", "gpt-4o"),
+}
+
+# task → (시작 tier, 시도당 제한 시간 초)
+DEFAULT_ROUTES: Dict[str, Tuple[str, float]] = {
+    "style_recommend": ("large", 60.0),
+    "style_adjust": ("small", 15.0),
+    "route_order": ("small", 8.0),
+}
+
+
+class ModelRouterError(Exception):
+    """Every model in the chain failed (timeout, API error, invalid JSON or failed validation)."""
+
+
+class ModelRouter:
+    def __init__(self, client_getter: Callable[[], Any], models: Dict[str, str] = MODELS, routes: Dict[str, Tuple[str, float]] = DEFAULT_ROUTES):
+        self._client_getter = client_getter
+        self.models = dict(models)
+        self.routes: Dict[str, Tuple[str, float]] = {}
+        for task, (tier, deadline) in routes.items():
+            env = task.upper()
+            tier = os.getenv(f"LLM_TIER_{env}", tier)
+            deadline = float(os.getenv(f"LLM_DEADLINE_{env}", str(deadline)))
+            self.routes[task] = (tier if tier in TIERS else "large", deadline)
+        # metrics
+        self.escalations: Counter = Counter()
+        self.timeouts: Counter = Counter()
+        self.invalid: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.exhausted: Counter = Counter()
+
+    def model_for(self, task: str) -> str:
+        tier, _ = self.routes.get(task, ("large", 60.0))
+        return self.models[tier]
+
+    def chain(self, task: str) -> List[str]:
+        """Models to try for `task`, starting tier first, then every larger tier."""
+        tier, _ = self.routes.get(task, ("large", 60.0))
+        chain = []
+        for t in TIERS[TIERS.index(tier):]:
+            if self.models[t] not in chain:
+                chain.append(self.models[t])
+        return chain
+
+    async def complete_json(
+        self,
+        task: str,
+        messages: List[Dict[str, str]],
+        validate: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        **kwargs: Any,
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        JSON-mode completion for `task`. `validate(data)` should raise if the reply is
+        unusable; the next model in the chain is then tried. Returns (data, model used).
+        """
+        _, deadline = self.routes.get(task, ("large", 60.0))
+        last_error: Optional[Exception] = None
+        for attempt, model in enumerate(self.chain(task)):
+            if attempt:
+                self.escalations[task] += 1
+                logger.info(f"[model_router] {task}: escalating to {model} ({last_error})")
+            try:
+                with track_llm_call(task, model) as call:
+                    response = await asyncio.wait_for(
+                        self._client_getter().chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            response_format={"type": "json_object"},
+                            **kwargs
+                        ),
+                        timeout=deadline,
+                    )
+                    call.usage = response.usage
+            except asyncio.TimeoutError:
+                self.timeouts[task] += 1
+                last_error = TimeoutError(f"{model} exceeded {deadline:.0f}s")
+                continue
+            except Exception as e:
+                # API 오류 (모델 미지원, 5xx 등)도 다음 모델로
+                self.errors[task] += 1
+                last_error = e
+                logger.warning(f"[model_router] {task}: {model} failed: {e}")
+                continue
+
+            content = response.choices[0].message.content
+            try:
+                if not content:
+                    raise ValueError("Empty response from OpenAI")
+                data = json.loads(content)
+                if validate is not None:
+                    validate(data)
+            except Exception as e:
+                self.invalid[task] += 1
+                last_error = e
+                logger.warning(f"[model_router] {task}: invalid reply from {model}: {e}")
+                continue
+            return data, model
+
+        self.exhausted[task] += 1
+        raise ModelRouterError(f"{task}: no valid reply ({last_error})")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routes": {task: {"chain": self.chain(task), "deadline_sec": d} for task, (_, d) in self.routes.items()},
+            "escalations": dict(self.escalations),
+            "timeouts": dict(self.timeouts),
+            "invalid": dict(self.invalid),
+            "errors": dict(self.errors),
+            "exhausted": dict(self.exhausted),
+        }
@@ -1,18 +1,78 @@
 import os
-import httpx
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from app.utils.http_client import http_clients
+from app.utils.singleflight import get_singleflight
+from app.utils.cache import get_cache
+from app.utils.persistent_cache import get_persistent_cache
+from app.services.transit_matrix import TransitMatrix
 
 logger = logging.getLogger(__name__)
 
+LEG_KEY_PRECISION = 3
+LEG_TTL = int(os.getenv("ODSAY_LEG_TTL", str(7 * 86400)))
+
+# 구간(출발 → 도착) 소요 시간 캐시: 메모리 + 워커 간 공유 SQLite
+leg_cache = get_cache("odsay_legs", max_entries=5000, max_bytes=4 * 1024 * 1024, default_ttl=LEG_TTL)
+leg_store = get_persistent_cache("odsay_legs", ttl=LEG_TTL)
+odsay_flight = get_singleflight("odsay")
+
 class ODsayService:
     def __init__(self):
         self.api_key = os.getenv("ODSAY_API_KEY")
-        self.base_url = "https://api.odsay.com/v1/api"
+        self.base_url = os.getenv("ODSAY_BASE_URL", "https://api.odsay.com/v1/api")
+        self.transit_matrix = TransitMatrix()
+
+    def load_transit_matrix(self) -> None:
+        """Memory-map the prebuilt store-to-store matrix (scripts/build_transit_matrix.py), if present."""
+        try:
+            self.transit_matrix.load()
+        except Exception as e:
+            logger.error(f"Failed to load transit matrix: {e}")
+
+    @staticmethod
+    def _leg_key(start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> str:
+        # 좌표를 소수점 3자리(약 100m)로 반올림 → 같은 매장 간 구간은 같은 키
+        p = LEG_KEY_PRECISION
+        return f"{round(start_lat, p)},{round(start_lng, p)}->{round(end_lat, p)},{round(end_lng, p)}"
 
     async def get_transit_route(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> Dict[str, Any]:
+        # 0) 사전 계산된 매장 간 행렬
+        leg = self.transit_matrix.lookup(start_lat, start_lng, end_lat, end_lng)
+        if leg is not None:
+            return leg
+
+        key = self._leg_key(start_lat, start_lng, end_lat, end_lng)
+
+        # 1) 구간 캐시 (메모리 → SQLite)
+        leg = leg_cache.get(key)
+        if leg is not None:
+            return leg
+        found, leg = await leg_store.get(key)
+        if found:
+            leg_cache.set(key, leg)
+            return leg
+
+        # 2) 같은 구간을 동시에 조회하면 ODsay 호출 한 번을 공유
+        return await odsay_flight.do(
+            key, lambda: self._fetch_and_cache(key, start_lat, start_lng, end_lat, end_lng)
+        )
+
+    async def _fetch_and_cache(self, key: str, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> Dict[str, Any]:
+        cacheable, leg = await self._fetch_transit_route(start_lat, start_lng, end_lat, end_lng)
+        # 키 누락/오류 응답은 캐시하지 않음
+        if cacheable:
+            leg_cache.set(key, leg)
+            await leg_store.set(key, leg)
+        return leg
+
+    async def _fetch_transit_route(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Returns (cacheable, leg). Fallback answers for missing keys, HTTP failures and ODsay
+        error bodies are not cacheable; only a real result with no path is cached as a negative.
+        """
         if not self.api_key:
-            return {
+            return False, {
                 "method": "Unknown",
                 "duration_min": 0,
                 "odsay_summary": "ODsay API Key missing"
@@ -29,46 +89,57 @@ class ODsayService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}{endpoint}", params=params, timeout=5.0)
-                
-                if response.status_code != 200:
-                    logger.error(f"ODsay API failed: {response.status_code} {response.text}")
-                    return {
-                        "method": "Train/Bus",
-                        "duration_min": 30, # Fallback estimate
-                        "odsay_summary": "Transit info unavailable"
-                    }
-                
-                data = response.json()
-                
-                if "result" not in data or "path" not in data["result"]:
-                     return {
-                        "method": "Walking/Taxi",
-                        "duration_min": 15,
-                        "odsay_summary": "No direct transit found"
-                    }
-
-                best_path = data["result"]["path"][0]
-                info = best_path["info"]
-                
-                # Determine main method
-                path_type = best_path["pathType"] # 1: Subway, 2: Bus, 3: Mixed
-                method = "Subway" if path_type == 1 else "Bus" if path_type == 2 else "Bus+Subway"
-                
-                # Format summary
-                total_time = info["totalTime"]
-                payment = info["payment"]
-                
-                return {
-                    "method": method,
-                    "duration_min": total_time,
-                    "odsay_summary": f"{method}, approx {total_time} mins, {payment} KRW"
+            client = http_clients.get(self.base_url)
+            response = await client.get(f"{self.base_url}{endpoint}", params=params)
+            
+            if response.status_code != 200:
+                logger.error(f"ODsay API failed: {response.status_code} {response.text}")
+                return False, {
+                    "method": "Train/Bus",
+                    "duration_min": 30, # Fallback estimate
+                    "odsay_summary": "Transit info unavailable"
+                }
+            
+            data = response.json()
+
+            # ODsay는 키 오류/한도 초과/거리 과소 등도 HTTP 200 + {"error": ...} 로 응답 → 캐시 금지
+            if "error" in data or "result" not in data:
+                logger.error(f"ODsay API error: {data.get('error', data)}")
+                return False, {
+                    "method": "Walking/Taxi",
+                    "duration_min": 15,
+                    "odsay_summary": "Transit info unavailable"
+                }
+            
+            # 정상 응답이지만 경로가 없을 때만 부정 결과로 캐시
+            if not data["result"].get("path"):
+                 return True, {
+                    "method": "Walking/Taxi",
+                    "duration_min": 15,
+                    "odsay_summary": "No direct transit found"
                 }
 
+            best_path = data["result"]["path"][0]
+            info = best_path["info"]
+            
+            # Determine main method
+            path_type = best_path["pathType"] # 1: Subway, 2: Bus, 3: Mixed
+            method = "Subway" if path_type == 1 else "Bus" if path_type == 2 else "Bus+Subway"
+            
+            # Format summary
+            total_time = info["totalTime"]
+            payment = info["payment"]
+            
+            return True, {
+                "method": method,
+                "duration_min": total_time,
+                "payment": payment,
+                "odsay_summary": f"{method}, approx {total_time} mins, {payment} KRW"
+            }
+
         except Exception as e:
             logger.error(f"ODsay service error: {e}")
-            return {
+            return False, {
                 "method": "Unknown",
                 "duration_min": 0,
                 "odsay_summary": "Service error"
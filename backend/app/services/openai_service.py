@@ -1,67 +1,30 @@
 import os
+import copy
 import json
+import asyncio
 import logging
 import urllib.parse
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from openai import AsyncOpenAI
+from app.services.brand_index import brand_index
+from app.services.style_cache import fingerprint, style_cache
+from app.utils.json_stream import JSONObjectStreamParser
+from app.utils.singleflight import get_singleflight
+from app.utils.llm_usage import track_llm_call
+from app.models.style import Outfit
+from app.services.model_router import ModelRouter
 
 logger = logging.getLogger(__name__)
 
+# 코디당 matching_stores 최대 개수
+MAX_MATCHING_STORES = 5
 
-def _make_placeholder_url(item_name: str, store_name: str = "") -> str:
-    encoded_name = urllib.parse.quote_plus(item_name or "fashion item")
-    encoded_brand = urllib.parse.quote_plus(store_name or "")
-    return f"/api/placeholder/image?text={encoded_name}&brand={encoded_brand}&w=400&h=400"
-
-
-class OpenAIService:
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=self.api_key)
-        self.model = "gpt-4o"
-        # self.stores_data removed (migration to Naver Local Search)
-
-    def _ensure_image_urls(self, data: dict):
-        for outfit in data.get("outfits", []):
-            for item in outfit.get("items", []):
-                url = item.get("image_url", "")
-                if not url or "via.placeholder" in url or "placehold.co" in url or "\x01" in url:
-                    item["image_url"] = _make_placeholder_url(
-                        item.get("name", "fashion item"),
-                        item.get("store_name", "")
-                    )
+recommend_flight = get_singleflight("style_recommend")
 
-    async def recommend_style(
-        self,
-        style_prefs: List[str],
-        budget: str,
-        occasion: str,
-        colors: List[str],
-        gender: str,
-        weather: Dict[str, Any],
-        language: str
-    ) -> Dict[str, Any]:
-
-        # budget 파싱 — 안전하게
-        try:
-            budget_clean = str(budget).replace(',', '').replace('₩', '').replace(' ', '')
-            budget_val = int(budget_clean)
-            budget_min = max(budget_val // 2, 30000)
-            budget_max = budget_val * 2
-        except Exception:
-            budget_min = 50000
-            budget_max = 200000
-
-        # weather 안전하게 꺼내기
-        w_temp = weather.get("temp", 15)
-        w_condition = weather.get("condition", "clear")
-        w_humidity = weather.get("humidity", 50)
-
-        # 프롬프트에서 중괄호를 이스케이프하기 위해 별도 변수 사용
-        example_url = "https://placehold.co/400x400/FFF0F5/333333.png?text=Oversized+Knit+Sweater&font=roboto"
-
-        prompt = f"""The user's gender is: {gender}
+# 추천 프롬프트의 정적 부분. 매 요청 동일한 prefix라 OpenAI 프롬프트 캐시 대상이 됨
+# (요청별 값은 _build_recommend_messages의 user 메시지로)
+RECOMMEND_SYSTEM_PROMPT = """You are K-Fit, a Korean fashion trend expert and shopping guide for tourists. Always respond in valid JSON only. No markdown, no explanation.
 
 CRITICAL RULE: 
 - If gender is "male": recommend ONLY men's clothing. No women's items, no skirts, no women's blouses.
@@ -72,14 +35,7 @@ You are K-Fit, an AI K-fashion travel guide for foreign tourists visiting Seoul.
 
 ## YOUR TASK
 1. Based on your knowledge of Korean fashion trends in 2024-2025, analyze current styles.
-2. Create 3 outfit recommendations using REAL Korean fashion brands available in Seoul.
-
-## USER PREFERENCES
-- Gender: {gender}
-- Styles/Keywords: {json.dumps(style_prefs)}
-- Total Budget: ₩{budget_min:,}~₩{budget_max:,}
-- Occasion: {occasion}
-- Preferred Colors: {json.dumps(colors)}
+2. Create 3 outfit recommendations using REAL Korean fashion brands available in Seoul, following the USER PREFERENCES in the user message.
 
 CRITICAL BRAND RULES:
 - If "Modern Hanbok" or "Tradition-core" is in styles: AT LEAST 2 out of 3 outfits MUST include items from Korean Hanbok brands: LEESLE, TCHAI KIM, OUWR, Bukchonzalak, DAHAM(다함), Navue Hanbok(나뷰한복).
@@ -117,14 +73,14 @@ CRITICAL: For Korean Hanbok brands, you MUST use Korean product names:
 ## OUTPUT FORMAT (strict JSON):
 Return ONLY a valid JSON object with this exact structure:
 
-{{
-    "trend_analysis": {{
+{
+    "trend_analysis": {
         "current_trends": ["trend1", "trend2", "trend3"],
         "trend_source": "Based on 2024-2025 Korean fashion trends",
         "season_note": "season description"
-    }},
+    },
     "outfits": [
-        {{
+        {
             "id": "outfit_1",
             "name": "Creative outfit name",
             "description": "Why this outfit is trendy",
@@ -132,62 +88,297 @@ Return ONLY a valid JSON object with this exact structure:
             "trend_source": "Which Korean trend this reflects",
             "culture_tip": "Mandatory. A short tip about Korean culture related to the outfit.",
             "items": [
-                {{
+                {
                     "type": "top",
                     "name": "Specific item name",
                     "price": 39900,
-                    "image_url": "{example_url}",
+                    "image_url": "https://placehold.co/400x400/FFF0F5/333333.png?text=Oversized+Knit+Sweater&font=roboto",
                     "image_keyword": "item keyword for search",
                     "store_id": "brand_spao",
                     "store_name": "SPAO",
                     "store_area": "Seoul",
                     "hotel_delivery": false 
-                }}
+                }
             ],
             "matching_stores": [], 
             "total_price": 119700
-        }}
+        }
     ],
-    "weather": {{"temp": {w_temp}, "condition": "{w_condition}", "humidity": {w_humidity}}},
-    "language": "{language}"
-}}
+    "weather": {"temp": 15, "condition": "Clear", "humidity": 50},
+    "language": "en"
+}
 
-ALL text fields must be in {language}.
 Prices must be in KRW (Korean Won).
 """
-        
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are K-Fit, a Korean fashion trend expert and shopping guide for tourists. Always respond in valid JSON only. No markdown, no explanation."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
 
-            result_text = response.choices[0].message.content
-            if not result_text:
-                raise ValueError("Empty response from OpenAI")
+ADJUST_SYSTEM_PROMPT = """You are a K-fashion style consultant.
+Modify the given outfit based on the user's adjustment request.
+For image_url, use: https://placehold.co/400x400/FFF0F5/333333?text=ITEM+NAME&font=roboto
+Return a JSON object with the single modified outfit (same schema as one outfit object)."""
 
-            result = json.loads(result_text)
+# adjust_style에 보낼 때 제외하는 필드 (응답 후 서버에서 다시 채움)
+_ADJUST_DROP_FIELDS = ("matching_stores",)
+_ADJUST_DROP_ITEM_FIELDS = ("image_url",)
 
-            # Post-processing: image_url 보장
-            self._ensure_image_urls(result)
 
-            return result
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse OpenAI JSON response: {e}")
-            logger.error(f"Raw response: {result_text[:500] if result_text else 'None'}")
-            raise ValueError(f"Invalid JSON from OpenAI: {e}")
+def _make_placeholder_url(item_name: str, store_name: str = "") -> str:
+    encoded_name = urllib.parse.quote_plus(item_name or "fashion item")
+    encoded_brand = urllib.parse.quote_plus(store_name or "")
+    return f"/api/placeholder/image?text={encoded_name}&brand={encoded_brand}&w=400&h=400"
+
+
+def parse_budget(budget: str) -> Tuple[int, int]:
+    """'100,000' -> (50000, 200000): the total budget range given to GPT."""
+    try:
+        budget_clean = str(budget).replace(',', '').replace('₩', '').replace(' ', '')
+        budget_val = int(budget_clean)
+        return max(budget_val // 2, 30000), budget_val * 2
+    except Exception:
+        return 50000, 200000
+
+
+def _validate_recommendation(data: Dict[str, Any]):
+    outfits = data.get("outfits")
+    if not isinstance(outfits, list) or not outfits:
+        raise ValueError("recommendation has no outfits")
+    for outfit in outfits:
+        if not isinstance(outfit, dict) or not isinstance(outfit.get("items"), list) or not outfit["items"]:
+            raise ValueError("outfit without items")
+
+
+class OpenAIService:
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        # client 주입 시 (테스트/워머 스텁) 그대로 사용
+        self.client = client or AsyncOpenAI(api_key=self.api_key)
+        # task별 모델 선택 / 검증 실패 시 상위 모델로 escalation (LLM_MODEL_*, LLM_TIER_*, LLM_DEADLINE_*)
+        self.router = ModelRouter(lambda: self.client)
+        # self.stores_data removed (migration to Naver Local Search)
+        self._refills: Dict[str, asyncio.Future] = {}
+
+    def _ensure_image_urls(self, data: dict):
+        for outfit in data.get("outfits", []):
+            for item in outfit.get("items", []):
+                url = item.get("image_url", "")
+                if not url or "via.placeholder" in url or "placehold.co" in url or "\x01" in url:
+                    item["image_url"] = _make_placeholder_url(
+                        item.get("name", "fashion item"),
+                        item.get("store_name", "")
+                    )
+
+    def _attach_matching_stores(self, data: dict):
+        for outfit in data.get("outfits", []):
+            outfit["matching_stores"] = [
+                info.model_dump()
+                for info in brand_index.match_outfit(outfit, limit=MAX_MATCHING_STORES)
+            ]
+
+    def _build_recommend_messages(
+        self,
+        style_prefs: List[str],
+        budget: str,
+        occasion: str,
+        colors: List[str],
+        gender: str,
+        weather: Dict[str, Any],
+        language: str
+    ) -> List[Dict[str, str]]:
+        # 정적 지침은 RECOMMEND_SYSTEM_PROMPT (prefix 캐시), 요청별 값만 user 메시지로
+        budget_min, budget_max = parse_budget(budget)
+
+        # weather 안전하게 꺼내기
+        weather_json = json.dumps({
+            "temp": weather.get("temp", 15),
+            "condition": weather.get("condition", "clear"),
+            "humidity": weather.get("humidity", 50),
+        })
+
+        prompt = f"""The user's gender is: {gender}
+
+## USER PREFERENCES
+- Gender: {gender}
+- Styles/Keywords: {json.dumps(style_prefs)}
+- Total Budget: ₩{budget_min:,}~₩{budget_max:,}
+- Occasion: {occasion}
+- Preferred Colors: {json.dumps(colors)}
+
+## CURRENT SEOUL WEATHER (copy into "weather")
+{weather_json}
+
+## LANGUAGE
+Set "language" to "{language}". ALL text fields must be in {language}.
+"""
+        return [
+            {"role": "system", "content": RECOMMEND_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _postprocess_recommendation(self, data: dict):
+        # Post-processing: image_url 보장, 브랜드 → 매장 매칭
+        self._ensure_image_urls(data)
+        self._attach_matching_stores(data)
+
+    def preference_key(self, style_prefs, budget, occasion, colors, gender, weather, language) -> str:
+        return fingerprint(style_prefs, parse_budget(budget), occasion, colors, gender, weather, language)
+
+    def _serve_cached(self, result: Dict[str, Any], weather: Dict[str, Any]) -> Dict[str, Any]:
+        # 캐시된 코디는 그대로, 날씨는 현재 값으로
+        result["weather"] = {
+            "temp": weather.get("temp", 15),
+            "condition": weather.get("condition", "clear"),
+            "humidity": weather.get("humidity", 50),
+        }
+        return result
+
+    async def _generate_and_cache(self, key: str, *args) -> Dict[str, Any]:
+        result = await self._generate_recommendation(*args)
+        await style_cache.add(key, result)
+        return result
+
+    def _refill_variant(self, key: str, *args) -> None:
+        """Generate one more variant for a partly filled pool in the background."""
+        if key in self._refills:
+            return
+        task = asyncio.ensure_future(self._generate_and_cache(key, *args))
+        self._refills[key] = task
+
+        def _done(t: asyncio.Future):
+            self._refills.pop(key, None)
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning(f"Style variant refill failed: {t.exception()}")
+
+        task.add_done_callback(_done)
+
+    async def recommend_style(
+        self,
+        style_prefs: List[str],
+        budget: str,
+        occasion: str,
+        colors: List[str],
+        gender: str,
+        weather: Dict[str, Any],
+        language: str
+    ) -> Dict[str, Any]:
+        args = (style_prefs, budget, occasion, colors, gender, weather, language)
+        key = self.preference_key(*args)
+        cached, wants_more = await style_cache.pick(key)
+        if cached is not None:
+            if wants_more:
+                self._refill_variant(key, *args)
+            return self._serve_cached(cached, weather)
+
+        # 같은 fingerprint의 동시 요청은 한 번만 생성
+        result = await recommend_flight.do(key, lambda: self._generate_and_cache(key, *args))
+        return copy.deepcopy(result)
+
+    async def _generate_recommendation(
+        self,
+        style_prefs: List[str],
+        budget: str,
+        occasion: str,
+        colors: List[str],
+        gender: str,
+        weather: Dict[str, Any],
+        language: str
+    ) -> Dict[str, Any]:
+        messages = self._build_recommend_messages(style_prefs, budget, occasion, colors, gender, weather, language)
+        try:
+            result, _ = await self.router.complete_json(
+                "style_recommend", messages, validate=_validate_recommendation, temperature=0.7
+            )
         except Exception as e:
             logger.error(f"OpenAI recommendation failed: {e}")
-            raise e
+            raise ValueError(f"OpenAI recommendation failed: {e}")
+
+        self._postprocess_recommendation(result)
+        return result
+
+    async def recommend_style_stream(
+        self,
+        style_prefs: List[str],
+        budget: str,
+        occasion: str,
+        colors: List[str],
+        gender: str,
+        weather: Dict[str, Any],
+        language: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Same as recommend_style, streamed. Yields ("trend_analysis", {...}) and one
+        ("outfit", {...}) per outfit as soon as its JSON is complete (post-processed like
+        the blocking call), then ("result", full response). Cached variants are replayed.
+        A final response that fails validation raises ValueError and is not cached.
+        """
+        args = (style_prefs, budget, occasion, colors, gender, weather, language)
+        key = self.preference_key(*args)
+        cached, wants_more = await style_cache.pick(key)
+        if cached is not None:
+            if wants_more:
+                self._refill_variant(key, *args)
+            result = self._serve_cached(cached, weather)
+            if result.get("trend_analysis"):
+                yield "trend_analysis", result["trend_analysis"]
+            for outfit in result.get("outfits", []):
+                yield "outfit", outfit
+            yield "result", result
+            return
+
+        messages = self._build_recommend_messages(*args)
+        parser = JSONObjectStreamParser(stream_arrays={"outfits"})
+
+        # 스트리밍은 이미 내보낸 코디를 되돌릴 수 없으므로 escalation 없이 task 모델 하나로
+        model = self.router.model_for("style_recommend")
+        with track_llm_call("style_recommend_stream", model) as call:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                # include_usage: 마지막 청크는 choices 없이 usage만 담김
+                if getattr(chunk, "usage", None) is not None:
+                    call.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                for field, value in parser.feed(delta):
+                    if field == "outfits" and isinstance(value, dict):
+                        self._postprocess_recommendation({"outfits": [value]})
+                        yield "outfit", value
+                    elif field == "trend_analysis":
+                        yield "trend_analysis", value
+
+        try:
+            result = json.loads(parser.buffer)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse streamed OpenAI JSON response: {e}")
+            logger.error(f"Raw response: {parser.buffer[:500]}")
+            raise ValueError(f"Invalid JSON from OpenAI: {e}")
+        # 비스트리밍 경로와 같은 검증: 거절/빈 outfits/잘린 응답은 캐시하지 않고 error 이벤트로
+        try:
+            _validate_recommendation(result)
+        except ValueError as e:
+            logger.error(f"Streamed recommendation rejected: {e}")
+            raise ValueError(f"Invalid recommendation from OpenAI: {e}")
+        self._postprocess_recommendation(result)
+        await style_cache.add(key, result)
+        yield "result", result
+
+    def _compact_outfit(self, outfit: Dict[str, Any]) -> str:
+        """Outfit JSON for the adjust prompt, without fields the server fills in afterwards."""
+        slim = {k: v for k, v in outfit.items() if k not in _ADJUST_DROP_FIELDS}
+        if isinstance(slim.get("items"), list):
+            slim["items"] = [
+                {k: v for k, v in item.items() if k not in _ADJUST_DROP_ITEM_FIELDS} if isinstance(item, dict) else item
+                for item in slim["items"]
+            ]
+        return json.dumps(slim, ensure_ascii=False, separators=(",", ":"))
 
     async def adjust_style(
         self,
@@ -196,43 +387,30 @@ Prices must be in KRW (Korean Won).
         language: str
     ) -> Dict[str, Any]:
 
-        system_prompt = f"""You are a K-fashion style consultant.
-Modify the given outfit based on the user's adjustment request.
-Target Language: {language}
-For image_url, use: https://placehold.co/400x400/FFF0F5/333333?text=ITEM+NAME&font=roboto
-Return a JSON object with the single modified outfit (same schema as one outfit object)."""
-
-        user_content = f"""Current Outfit: {json.dumps(current_outfit, ensure_ascii=False)}
+        user_content = f"""Target Language: {language}
+Current Outfit: {self._compact_outfit(current_outfit)}
 Adjustment Request: {adjustment_request}"""
 
+        def _validate(data: Dict[str, Any]):
+            # image_url 보장, 매장 매칭 (프롬프트에서 뺀 필드 복원) 후 Outfit 스키마 검증
+            if not isinstance(data.get("items"), list):
+                raise ValueError("adjusted outfit has no items")
+            self._postprocess_recommendation({"outfits": [data]})
+            Outfit.model_validate(data)
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
+            data, _ = await self.router.complete_json(
+                "style_adjust",
+                [
+                    {"role": "system", "content": ADJUST_SYSTEM_PROMPT},
                     {"role": "user", "content": user_content}
                 ],
-                response_format={"type": "json_object"}
+                validate=_validate,
             )
-
-            content = response.choices[0].message.content
-            data = json.loads(content)
-
-            # image_url 보장
-            if "items" in data:
-                for item in data["items"]:
-                    url = item.get("image_url", "")
-                    if not url or "via.placeholder" in url or "\x01" in url:
-                        item["image_url"] = _make_placeholder_url(
-                            item.get("name", "fashion item"),
-                            item.get("store_name", "")
-                        )
-
             return data
 
         except Exception as e:
             logger.error(f"OpenAI adjustment failed: {e}")
             raise e
 
-
 openai_service = OpenAIService()
@@ -0,0 +1,218 @@
+"""
+In-process shopping route optimizer.
+
+Orders the selected stores to minimize total trip time while respecting opening hours
+(StoreHours) and a fixed shopping dwell per store. Small plans are solved exactly with
+Held-Karp dynamic programming; larger ones use nearest-neighbor construction followed by
+2-opt and Or-opt improvement. Travel times come from a pluggable function (haversine
+estimate by default), so a cached transit-time matrix can be dropped in later.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+from app.utils.geo import haversine_km, walk_minutes
+
+logger = logging.getLogger(__name__)
+
+# Assume 45 mins shopping time per store
+DWELL_MINUTES = 45
+# 이 이하의 매장 수는 DP로 정확히 계산 (2^n * n^2)
+EXACT_MAX_STORES = 9
+
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+TravelFn = Callable[[float, float, float, float], int]
+
+
+def estimate_travel_minutes(start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> int:
+    """Door-to-door estimate: walk under 1km, otherwise ~24km/h transit plus 10 min access."""
+    distance = haversine_km(start_lat, start_lng, end_lat, end_lng)
+    if distance <= 1.0:
+        return walk_minutes(distance)
+    return round(10 + distance * 2.5)
+
+
+def parse_hhmm(value: str, default: int) -> int:
+    try:
+        hours, minutes = value.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+    except Exception:
+        return default
+
+
+def format_clock(minute_of_day: int) -> str:
+    """600 -> '10:00 AM'"""
+    minute_of_day %= 24 * 60
+    hours, minutes = divmod(minute_of_day, 60)
+    suffix = "AM" if hours < 12 else "PM"
+    return f"{(hours % 12) or 12}:{minutes:02d} {suffix}"
+
+
+@dataclass
+class RouteStop:
+    id: str
+    lat: float
+    lng: float
+    open_min: int = 0
+    close_min: int = 24 * 60
+    closed_today: bool = False
+
+
+@dataclass
+class RouteSchedule:
+    order: List[int]  # indices into the input stops
+    arrivals: List[int] = field(default_factory=list)  # minute of day shopping starts at each stop
+    travel_minutes: List[int] = field(default_factory=list)
+    end_minute: int = 0
+    late_stops: int = 0  # stops reached too late to finish shopping before closing
+
+
+def stop_from_store(store, weekday: Optional[int] = None) -> RouteStop:
+    """Build a RouteStop from an app.models.store.Store."""
+    closed_days = {d.lower()[:3] for d in store.hours.closed_days}
+    closed_today = weekday is not None and _WEEKDAYS[weekday][:3] in closed_days
+    return RouteStop(
+        id=store.id,
+        lat=store.location.lat,
+        lng=store.location.lng,
+        open_min=parse_hhmm(store.hours.open, 0),
+        close_min=parse_hhmm(store.hours.close, 24 * 60),
+        closed_today=closed_today,
+    )
+
+
+class RouteOptimizer:
+    def __init__(self, dwell_minutes: int = DWELL_MINUTES, exact_max_stores: int = EXACT_MAX_STORES):
+        self.dwell = dwell_minutes
+        self.exact_max = exact_max_stores
+
+    def _matrix(self, start: Tuple[float, float], stops: Sequence[RouteStop], travel_fn: TravelFn) -> List[List[int]]:
+        # node 0 = 출발지, node i+1 = stops[i]
+        points = [start] + [(s.lat, s.lng) for s in stops]
+        n = len(points)
+        return [
+            [0 if i == j else travel_fn(points[i][0], points[i][1], points[j][0], points[j][1]) for j in range(n)]
+            for i in range(n)
+        ]
+
+    def _visit(self, t: int, stop: RouteStop) -> Tuple[int, bool]:
+        """Arrive at `t`; returns (shopping start, late?)."""
+        begin = max(t, stop.open_min)
+        late = stop.closed_today or begin + self.dwell > stop.close_min
+        return begin, late
+
+    def _simulate(self, order: Sequence[int], stops: Sequence[RouteStop], matrix: List[List[int]], start_minute: int) -> Tuple[int, int]:
+        """Cost of visiting `order`: (late stops, finish minute). Lower is better."""
+        t, prev, late_count = start_minute, 0, 0
+        for idx in order:
+            begin, late = self._visit(t + matrix[prev][idx + 1], stops[idx])
+            late_count += late
+            t = begin + self.dwell
+            prev = idx + 1
+        return late_count, t
+
+    def _solve_exact(self, stops: Sequence[RouteStop], matrix: List[List[int]], start_minute: int) -> List[int]:
+        n = len(stops)
+        full = (1 << n) - 1
+        INF = (n + 1, float("inf"))
+        # best[mask][j] = (late, finish time) ending at stop j having visited mask
+        best = [[INF] * n for _ in range(1 << n)]
+        parent = [[-1] * n for _ in range(1 << n)]
+
+        for j in range(n):
+            begin, late = self._visit(start_minute + matrix[0][j + 1], stops[j])
+            best[1 << j][j] = (int(late), begin + self.dwell)
+
+        for mask in range(1, full + 1):
+            row = best[mask]
+            for j in range(n):
+                cur = row[j]
+                if cur is INF or not (mask >> j) & 1:
+                    continue
+                late_j, t_j = cur
+                for k in range(n):
+                    if (mask >> k) & 1:
+                        continue
+                    begin, late = self._visit(t_j + matrix[j + 1][k + 1], stops[k])
+                    cand = (late_j + late, begin + self.dwell)
+                    nxt = mask | (1 << k)
+                    if cand < best[nxt][k]:
+                        best[nxt][k] = cand
+                        parent[nxt][k] = j
+
+        last = min(range(n), key=lambda j: best[full][j])
+        order, mask = [], full
+        while last != -1:
+            order.append(last)
+            prev = parent[mask][last]
+            mask ^= 1 << last
+            last = prev
+        return order[::-1]
+
+    def _solve_heuristic(self, stops: Sequence[RouteStop], matrix: List[List[int]], start_minute: int) -> List[int]:
+        n = len(stops)
+        cost = lambda o: self._simulate(o, stops, matrix, start_minute)
+
+        # Nearest neighbor (시간창 고려한 다음 방문지 선택)
+        order, remaining = [], set(range(n))
+        while remaining:
+            order.append(min(remaining, key=lambda k: cost(order + [k])))
+            remaining.remove(order[-1])
+
+        best_cost = cost(order)
+        improved = True
+        while improved:
+            improved = False
+            # 2-opt: 구간 뒤집기
+            for i in range(n - 1):
+                for j in range(i + 1, n):
+                    cand = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                    c = cost(cand)
+                    if c < best_cost:
+                        order, best_cost, improved = cand, c, True
+            # Or-opt: 길이 1~3 구간을 다른 위치로 이동
+            for seg_len in (1, 2, 3):
+                for i in range(n - seg_len + 1):
+                    segment = order[i:i + seg_len]
+                    rest = order[:i] + order[i + seg_len:]
+                    for pos in range(len(rest) + 1):
+                        if pos == i:
+                            continue
+                        cand = rest[:pos] + segment + rest[pos:]
+                        c = cost(cand)
+                        if c < best_cost:
+                            order, best_cost, improved = cand, c, True
+                            break
+        return order
+
+    def solve(
+        self,
+        start: Tuple[float, float],
+        stops: Sequence[RouteStop],
+        start_minute: int = 10 * 60,
+        travel_fn: TravelFn = estimate_travel_minutes,
+    ) -> RouteSchedule:
+        if not stops:
+            return RouteSchedule(order=[], end_minute=start_minute)
+
+        matrix = self._matrix(start, stops, travel_fn)
+        if len(stops) <= self.exact_max:
+            order = self._solve_exact(stops, matrix, start_minute)
+        else:
+            order = self._solve_heuristic(stops, matrix, start_minute)
+
+        schedule = RouteSchedule(order=order)
+        t, prev = start_minute, 0
+        for idx in order:
+            travel = matrix[prev][idx + 1]
+            begin, late = self._visit(t + travel, stops[idx])
+            schedule.travel_minutes.append(travel)
+            schedule.arrivals.append(begin)
+            schedule.late_stops += late
+            t = begin + self.dwell
+            prev = idx + 1
+        schedule.end_minute = t
+        return schedule
+
+
+route_optimizer = RouteOptimizer()
@@ -0,0 +1,351 @@
+"""
+Curated store catalog (app/data/stores.json).
+
+Parsed and validated once at startup, then held column-wise: NumPy arrays for coordinates,
+rating, price range and opening hours, and bitsets over interned ids for `style_tags` and
+`features`. Each store's full record is kept as its compact JSON text and turned into a
+`Store` model only when it is returned to a client, so filters and distance queries run
+as vectorized array operations without touching Pydantic objects.
+
+A uniform lat/lng grid over the coordinate columns serves radius and k-nearest queries, so
+`/nearby` only looks at the handful of cells around the user instead of every store.
+"""
+import json
+import math
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.models.store import Store
+from app.utils.geo import haversine_km_array
+
+logger = logging.getLogger(__name__)
+
+STORES_JSON_PATH = Path(__file__).resolve().parent.parent / "data" / "stores.json"
+
+# 격자 한 칸 크기 (도). 서울 기준 약 1.1km x 0.9km
+CELL_DEG = 0.01
+KM_PER_DEG_LAT = 111.32
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# query(sort="score") 가중치: 평점 + 스타일 일치율 + 거리 (exp 감쇠)
+SCORE_RATING_WEIGHT = 1.0
+SCORE_STYLE_WEIGHT = 1.0
+SCORE_DISTANCE_WEIGHT = 1.0
+SCORE_DISTANCE_SCALE_KM = 2.0
+
+
+def _cell_of(lat: float, lng: float) -> Tuple[int, int]:
+    return (math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG))
+
+
+def _parse_hhmm(value: str, default: int) -> int:
+    try:
+        hours, minutes = value.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+    except Exception:
+        return default
+
+
+class TagIndex:
+    """Interned tag vocabulary plus one bitset row (uint64 words) per store."""
+
+    def __init__(self, rows: Sequence[Iterable[str]]):
+        self.ids: Dict[str, int] = {}
+        for tags in rows:
+            for tag in tags:
+                self.ids.setdefault(tag, len(self.ids))
+        self.names: List[str] = list(self.ids)
+
+        words = max(1, (len(self.ids) + 63) // 64)
+        self.bits = np.zeros((len(rows), words), dtype=np.uint64)
+        for row, tags in enumerate(rows):
+            for tag in tags:
+                tag_id = self.ids[tag]
+                self.bits[row, tag_id // 64] |= np.uint64(1 << (tag_id % 64))
+
+    def query_bits(self, tags: Iterable[str]) -> Tuple[np.ndarray, bool]:
+        """Bitset for `tags`; the flag is False if any tag is not in the vocabulary."""
+        query = np.zeros(self.bits.shape[1], dtype=np.uint64)
+        known = True
+        for tag in tags:
+            tag_id = self.ids.get(tag)
+            if tag_id is None:
+                known = False
+                continue
+            query[tag_id // 64] |= np.uint64(1 << (tag_id % 64))
+        return query, known
+
+    def mask(self, tags: Iterable[str], match: str = "any") -> np.ndarray:
+        """Stores having any (or all) of `tags`."""
+        query, known = self.query_bits(tags)
+        hit = self.bits & query
+        if match == "all":
+            if not known:
+                return np.zeros(len(self.bits), dtype=bool)
+            return (hit == query).all(axis=1)
+        return hit.any(axis=1)
+
+    def count(self, tags: Iterable[str]) -> np.ndarray:
+        """Number of `tags` each store has."""
+        query, _ = self.query_bits(tags)
+        hit = self.bits & query
+        return np.unpackbits(hit.view(np.uint8), axis=1).sum(axis=1, dtype=np.int32)
+
+
+@dataclass
+class StoreQueryResult:
+    rows: np.ndarray  # catalog rows, best first
+    distances_km: Optional[np.ndarray] = None
+    scores: Optional[np.ndarray] = None
+    total: int = 0  # matches before top-k
+
+
+class StoreCatalog:
+    def __init__(self):
+        self.ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._records: List[str] = []  # 매장별 JSON (응답 시 Store로 변환)
+        self.lat = np.empty(0)
+        self.lng = np.empty(0)
+        self.rating = np.empty(0, dtype=np.float32)
+        self.price_min = np.empty(0, dtype=np.int64)
+        self.price_max = np.empty(0, dtype=np.int64)
+        self.open_min = np.empty(0, dtype=np.int16)
+        self.close_min = np.empty(0, dtype=np.int16)
+        self.closed_days = np.empty(0, dtype=np.uint8)  # bit i = WEEKDAYS[i] 휴무
+        self.areas: List[str] = []
+        self.area_ids = np.empty(0, dtype=np.int16)
+        self.style_tags = TagIndex([])
+        self.features = TagIndex([])
+        self._grid: Dict[Tuple[int, int], np.ndarray] = {}
+        self._bounds: Optional[Tuple[int, int, int, int]] = None  # min_i, max_i, min_j, max_j
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def load(self, path: Path = STORES_JSON_PATH) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+
+        # 로드 시 한 번만 검증하고, 이후에는 컬럼과 JSON 텍스트만 보관
+        stores = [Store(**s) for s in raw]
+        n = len(stores)
+
+        self.ids = [s.id for s in stores]
+        self._row = {store_id: i for i, store_id in enumerate(self.ids)}
+        self._records = [s.model_dump_json(exclude_none=True) for s in stores]
+        self.lat = np.array([s.location.lat for s in stores], dtype=np.float64)
+        self.lng = np.array([s.location.lng for s in stores], dtype=np.float64)
+        self.rating = np.array([s.rating for s in stores], dtype=np.float32)
+        self.price_min = np.array([s.price_range.min for s in stores], dtype=np.int64)
+        self.price_max = np.array([s.price_range.max for s in stores], dtype=np.int64)
+        self.open_min = np.array([_parse_hhmm(s.hours.open, 0) for s in stores], dtype=np.int16)
+        self.close_min = np.array([_parse_hhmm(s.hours.close, 24 * 60) for s in stores], dtype=np.int16)
+        self.closed_days = np.zeros(n, dtype=np.uint8)
+        for i, s in enumerate(stores):
+            for day in s.hours.closed_days:
+                if day.lower()[:3] in WEEKDAYS:
+                    self.closed_days[i] |= 1 << WEEKDAYS.index(day.lower()[:3])
+
+        self.areas = sorted({s.area for s in stores})
+        area_index = {a: i for i, a in enumerate(self.areas)}
+        self.area_ids = np.array([area_index[s.area] for s in stores], dtype=np.int16)
+        self.style_tags = TagIndex([s.style_tags for s in stores])
+        self.features = TagIndex([s.features for s in stores])
+
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for idx in range(n):
+            cells.setdefault(_cell_of(self.lat[idx], self.lng[idx]), []).append(idx)
+        self._grid = {cell: np.array(rows, dtype=np.int64) for cell, rows in cells.items()}
+
+        if self._grid:
+            cells_i = [c[0] for c in self._grid]
+            cells_j = [c[1] for c in self._grid]
+            self._bounds = (min(cells_i), max(cells_i), min(cells_j), max(cells_j))
+        else:
+            self._bounds = None
+        logger.info(
+            f"Store catalog loaded: {n} stores, {len(self._grid)} grid cells, "
+            f"{len(self.style_tags.names)} style tags, {len(self.features.names)} features"
+        )
+
+    # --- Materialization (response boundary) ---
+
+    def store(self, row: int) -> Store:
+        return Store.model_validate_json(self._records[row])
+
+    def stores(self, rows: Optional[Iterable[int]] = None) -> List[Store]:
+        if rows is None:
+            rows = range(len(self))
+        return [self.store(int(row)) for row in rows]
+
+    def row_of(self, store_id: str) -> Optional[int]:
+        return self._row.get(store_id)
+
+    def get(self, store_id: str) -> Optional[Store]:
+        row = self._row.get(store_id)
+        return None if row is None else self.store(row)
+
+    # --- Vectorized queries ---
+
+    def distances_km(self, lat: float, lng: float, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is None:
+            return haversine_km_array(lat, lng, self.lat, self.lng)
+        return haversine_km_array(lat, lng, self.lat[rows], self.lng[rows])
+
+    def price_overlap_mask(self, budget_min: Optional[int] = None, budget_max: Optional[int] = None) -> np.ndarray:
+        """Stores whose price range overlaps [budget_min, budget_max]."""
+        mask = np.ones(len(self), dtype=bool)
+        if budget_min is not None:
+            mask &= self.price_max >= budget_min
+        if budget_max is not None:
+            mask &= self.price_min <= budget_max
+        return mask
+
+    def open_mask(self, weekday: int, minute_of_day: int) -> np.ndarray:
+        """Stores open at `minute_of_day` on `weekday` (0 = Monday), per StoreHours."""
+        t = minute_of_day
+        overnight = self.close_min <= self.open_min  # e.g. 10:00 ~ 02:00
+        within = np.where(
+            overnight,
+            (t >= self.open_min) | (t < self.close_min),
+            (t >= self.open_min) & (t < self.close_min),
+        )
+        closed_today = (self.closed_days >> weekday) & 1
+        return within & (closed_today == 0)
+
+    def query(
+        self,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        area: Optional[str] = None,
+        style_tags: Sequence[str] = (),
+        style_match: str = "any",
+        features: Sequence[str] = (),
+        budget_min: Optional[int] = None,
+        budget_max: Optional[int] = None,
+        open_at: Optional[Tuple[int, int]] = None,
+        min_rating: Optional[float] = None,
+        sort: str = "score",
+        k: int = 20,
+    ) -> StoreQueryResult:
+        """
+        Filter and rank the whole catalog in one vectorized pass.
+
+        Filters: distance (needs lat/lng), area, style tags (any/all), features (all required),
+        price range overlap with the budget, open at (weekday, minute) and minimum rating.
+        `sort` is "score" (blend of rating, style match and proximity), "distance" or "rating".
+        Only the top `k` rows are fully sorted (argpartition).
+        """
+        n = len(self)
+        mask = np.ones(n, dtype=bool)
+
+        has_location = lat is not None and lng is not None
+        dists = self.distances_km(lat, lng) if has_location else None
+        if dists is not None and radius_km is not None:
+            mask &= dists <= radius_km
+        if area is not None:
+            mask &= self.area_ids == (self.areas.index(area) if area in self.areas else -1)
+        if style_tags:
+            mask &= self.style_tags.mask(style_tags, match=style_match)
+        if features:
+            mask &= self.features.mask(features, match="all")
+        if budget_min is not None or budget_max is not None:
+            mask &= self.price_overlap_mask(budget_min, budget_max)
+        if open_at is not None:
+            mask &= self.open_mask(*open_at)
+        if min_rating is not None:
+            mask &= self.rating >= min_rating
+
+        rows = np.flatnonzero(mask)
+        if sort == "distance" and dists is not None:
+            keys = dists[rows]
+        elif sort == "rating":
+            keys = -self.rating[rows].astype(np.float64)
+        else:
+            score = SCORE_RATING_WEIGHT * self.rating[rows] / 5.0
+            if style_tags:
+                matched = self.style_tags.count(style_tags)[rows]
+                score = score + SCORE_STYLE_WEIGHT * matched / len(set(style_tags))
+            if dists is not None:
+                score = score + SCORE_DISTANCE_WEIGHT * np.exp(-dists[rows] / SCORE_DISTANCE_SCALE_KM)
+            keys = -score
+
+        total = len(rows)
+        if k < total:
+            top = np.argpartition(keys, k - 1)[:k]
+        else:
+            top = np.arange(total)
+        top = top[np.argsort(keys[top], kind="stable")]
+
+        rows = rows[top]
+        return StoreQueryResult(
+            rows=rows,
+            distances_km=dists[rows] if dists is not None else None,
+            scores=-keys[top] if sort == "score" else None,
+            total=total,
+        )
+
+    def _ring(self, center: Tuple[int, int], r: int):
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for i in range(ci - r, ci + r + 1):
+            yield (i, cj - r)
+            yield (i, cj + r)
+        for j in range(cj - r + 1, cj + r):
+            yield (ci - r, j)
+            yield (ci + r, j)
+
+    def _max_ring(self, center: Tuple[int, int]) -> int:
+        if self._bounds is None:
+            return -1
+        min_i, max_i, min_j, max_j = self._bounds
+        ci, cj = center
+        return max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j))
+
+    def nearby_rows(self, lat: float, lng: float, radius_km: Optional[float] = None, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, distances_km) around (lat, lng), nearest first. See `nearby`."""
+        center = _cell_of(lat, lng)
+        # 한 칸의 최소 폭 (km): 링 r 안의 점은 최소 (r - 1) * cell_km 이상 떨어져 있음
+        cell_km = CELL_DEG * KM_PER_DEG_LAT * min(1.0, math.cos(math.radians(lat)))
+        max_ring = self._max_ring(center)
+        if radius_km is not None:
+            max_ring = min(max_ring, int(radius_km // cell_km) + 1)
+
+        rows = np.empty(0, dtype=np.int64)
+        dists = np.empty(0)
+        for r in range(max_ring + 1):
+            if k is not None and len(rows) >= k and dists[k - 1] <= r * cell_km - cell_km:
+                break
+            found = [self._grid[cell] for cell in self._ring(center, r) if cell in self._grid]
+            if not found:
+                continue
+            ring_rows = np.concatenate(found)
+            ring_dists = self.distances_km(lat, lng, ring_rows)
+            if radius_km is not None:
+                keep = ring_dists <= radius_km
+                ring_rows, ring_dists = ring_rows[keep], ring_dists[keep]
+            rows = np.concatenate([rows, ring_rows])
+            dists = np.concatenate([dists, ring_dists])
+            order = np.argsort(dists, kind="stable")
+            if k is not None:
+                order = order[:k]
+            rows, dists = rows[order], dists[order]
+        return rows, dists
+
+    def nearby(self, lat: float, lng: float, radius_km: Optional[float] = None, k: Optional[int] = None) -> List[Tuple[Store, float]]:
+        """
+        Stores around (lat, lng), nearest first, as (store, distance_km) pairs.
+        `radius_km` limits the distance, `k` limits the count; at least one should be given.
+        """
+        rows, dists = self.nearby_rows(lat, lng, radius_km=radius_km, k=k)
+        return [(self.store(int(row)), float(d)) for row, d in zip(rows, dists)]
+
+
+store_catalog = StoreCatalog()
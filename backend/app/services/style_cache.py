@@ -0,0 +1,128 @@
+"""
+Semantic response cache for style recommendations.
+
+Requests are keyed on a normalized preference fingerprint rather than the raw body: gender,
+sorted style keywords, occasion, colors, a budget bucket, a weather band (temperature range +
+dry/wet/snow) and language. Each fingerprint keeps a pool of up to STYLE_CACHE_VARIANTS
+GPT generations in the SQLite cache; hits are served from a random variant so repeat
+preference sets come back in milliseconds without every user seeing the same outfits.
+"""
+import os
+import time
+import bisect
+import random
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.persistent_cache import get_persistent_cache
+
+logger = logging.getLogger(__name__)
+
+STYLE_CACHE_TTL = int(os.getenv("STYLE_CACHE_TTL", str(6 * 3600)))
+STYLE_CACHE_VARIANTS = int(os.getenv("STYLE_CACHE_VARIANTS", "3"))
+
+# budget_max 기준 구간 경계 (KRW)
+BUDGET_BUCKETS = [100_000, 200_000, 400_000, 800_000]
+# 기온 구간 경계 (°C): cold / cool / mild / warm / hot
+TEMP_BANDS = [5, 12, 20, 27]
+TEMP_BAND_NAMES = ["cold", "cool", "mild", "warm", "hot"]
+
+
+def _norm(value: str) -> str:
+    return " ".join(str(value).lower().split())
+
+
+def budget_bucket(budget_min: int, budget_max: int) -> int:
+    return bisect.bisect_right(BUDGET_BUCKETS, budget_max)
+
+
+def weather_band(weather: Dict[str, Any]) -> str:
+    try:
+        temp = float(weather.get("temp", 15))
+    except (TypeError, ValueError):
+        temp = 15.0
+    condition = _norm(weather.get("condition", "clear"))
+    if "snow" in condition:
+        sky = "snow"
+    elif any(w in condition for w in ("rain", "drizzle", "thunder", "shower")):
+        sky = "wet"
+    else:
+        sky = "dry"
+    return f"{TEMP_BAND_NAMES[bisect.bisect_right(TEMP_BANDS, temp)]}-{sky}"
+
+
+def fingerprint(
+    style_prefs: List[str],
+    budget_range: Tuple[int, int],
+    occasion: str,
+    colors: List[str],
+    gender: str,
+    weather: Dict[str, Any],
+    language: str,
+) -> str:
+    key = {
+        "gender": _norm(gender),
+        "styles": sorted({_norm(s) for s in style_prefs if s}),
+        "occasion": _norm(occasion),
+        "colors": sorted({_norm(c) for c in colors if c}),
+        "budget": budget_bucket(*budget_range),
+        "weather": weather_band(weather),
+        "language": _norm(language),
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class StyleResponseCache:
+    def __init__(self, namespace: str = "style_recommend", ttl: int = STYLE_CACHE_TTL, variants: int = STYLE_CACHE_VARIANTS):
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self._store = get_persistent_cache(namespace, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    async def _pool(self, key: str) -> Optional[Dict[str, Any]]:
+        found, pool = await self._store.get(key)
+        if not found or not pool or not pool.get("variants"):
+            return None
+        return pool
+
+    async def size(self, key: str) -> int:
+        """Number of cached variants for `key` (does not count as a hit or miss)."""
+        pool = await self._pool(key)
+        return len(pool["variants"]) if pool else 0
+
+    async def pick(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(random cached variant or None, whether the pool still wants more variants)."""
+        pool = await self._pool(key)
+        if pool is None:
+            self.misses += 1
+            return None, True
+        self.hits += 1
+        return random.choice(pool["variants"]), len(pool["variants"]) < self.variants
+
+    async def add(self, key: str, result: Dict[str, Any]) -> None:
+        # 풀의 만료 시각은 첫 생성 시점 기준 (변형이 추가돼도 연장하지 않음)
+        now = time.time()
+        pool = await self._pool(key) or {"created_at": now, "variants": []}
+        if len(pool["variants"]) >= self.variants:
+            return
+        pool["variants"].append(result)
+        remaining = self.ttl - (now - pool["created_at"])
+        if remaining <= 0:
+            return
+        await self._store.set(key, pool, ttl=remaining)
+        self.stored += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "ttl": self.ttl,
+            "variants": self.variants,
+        }
+
+
+style_cache = StyleResponseCache()
@@ -0,0 +1,228 @@
+"""
+Background warmer for popular style recommendation combinations.
+
+Periodically generates recommendations for the most requested (gender × styles × occasion ×
+budget × language) combinations, plus a seed list matching the frontend defaults, through
+`OpenAIService.recommend_style` so they land in the style response cache, then resolves
+every item's product image through the placeholder lookup path. Cold requests for popular
+combinations are then served from cache. Upstream calls run at prefetch priority, so the
+warmer never delays interactive Naver traffic.
+
+Opt-in with STYLE_WARM_ENABLED=1 (each generated combination costs a GPT call). The service
+and weather source are injectable, so `run_once()` works against a stubbed OpenAI client.
+"""
+import os
+import asyncio
+import logging
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.services.style_cache import style_cache
+from app.utils.rate_limiter import prefetch_priority
+
+logger = logging.getLogger(__name__)
+
+STYLE_WARM_ENABLED = os.getenv("STYLE_WARM_ENABLED", "").lower() in ("1", "true", "yes")
+STYLE_WARM_INTERVAL = int(os.getenv("STYLE_WARM_INTERVAL", "3600"))
+STYLE_WARM_TOP_N = int(os.getenv("STYLE_WARM_TOP_N", "20"))
+STYLE_WARM_CONCURRENCY = int(os.getenv("STYLE_WARM_CONCURRENCY", "2"))
+
+# 집계할 조합 수 상한 (초과 시 가장 드문 조합부터 제거)
+MAX_TRACKED_COMBINATIONS = 1000
+
+PLACEHOLDER_IMAGE_PATH = "/api/placeholder/image"
+
+# 프론트엔드 기본값 기준 시드: styles 기본 ['street', 'casual'] + 선택 키워드, 예산 15만원
+DEFAULT_STYLES = ("street", "casual")
+SEED_KEYWORDS = [(), ("Minimal",), ("Y2K",), ("Modern Hanbok",)]
+SEED_GENDERS = ["female", "male"]
+SEED_OCCASIONS = ["Daily", "Travel"]
+SEED_BUDGETS = ["150000"]
+SEED_LANGUAGES = ["en", "ko"]
+
+
+def _image_gender(gender: str) -> str:
+    """The gender the frontend appends to placeholder URLs: the saved value, or "" when unset (sent as Unisex)."""
+    return "" if gender.lower() == "unisex" else gender
+
+
+@dataclass(frozen=True)
+class StyleCombination:
+    style_prefs: Tuple[str, ...]
+    budget: str
+    occasion: str
+    colors: Tuple[str, ...]
+    gender: str
+    language: str
+
+
+def seed_combinations() -> List[StyleCombination]:
+    return [
+        StyleCombination(DEFAULT_STYLES + keywords, budget, occasion, (), gender, language)
+        for keywords in SEED_KEYWORDS
+        for gender in SEED_GENDERS
+        for occasion in SEED_OCCASIONS
+        for budget in SEED_BUDGETS
+        for language in SEED_LANGUAGES
+    ]
+
+
+class StyleWarmer:
+    def __init__(
+        self,
+        service=None,
+        weather_fn: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None,
+        seeds: Optional[List[StyleCombination]] = None,
+        top_n: int = STYLE_WARM_TOP_N,
+        concurrency: int = STYLE_WARM_CONCURRENCY,
+    ):
+        self._service = service
+        self._weather_fn = weather_fn
+        self.seeds = seed_combinations() if seeds is None else seeds
+        self.top_n = top_n
+        self.concurrency = max(1, concurrency)
+        self._counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        # metrics
+        self.runs = 0
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.images_resolved = 0
+        self.last_run: Optional[Dict[str, int]] = None
+
+    @property
+    def service(self):
+        if self._service is None:
+            from app.services.openai_service import openai_service
+            self._service = openai_service
+        return self._service
+
+    async def _weather(self) -> Dict[str, Any]:
+        if self._weather_fn is None:
+            from app.services.weather_service import weather_service
+            self._weather_fn = weather_service.get_seoul_weather
+        return await self._weather_fn()
+
+    def record(self, style_prefs: List[str], budget: str, occasion: str, colors: List[str], gender: str, language: str) -> None:
+        """Count a user request so popular combinations are warmed first."""
+        combo = StyleCombination(tuple(style_prefs), str(budget), occasion, tuple(colors), gender, language)
+        self._counts[combo] += 1
+        if len(self._counts) > MAX_TRACKED_COMBINATIONS:
+            for rare, _ in self._counts.most_common()[MAX_TRACKED_COMBINATIONS // 2:]:
+                del self._counts[rare]
+
+    def combinations(self, weather: Dict[str, Any]) -> List[StyleCombination]:
+        """Most requested combinations first, then seeds; one per cache fingerprint, at most top_n."""
+        ordered = [combo for combo, _ in self._counts.most_common()] + self.seeds
+        picked, keys = [], set()
+        for combo in ordered:
+            key = self._key(combo, weather)
+            if key in keys:
+                continue
+            keys.add(key)
+            picked.append(combo)
+            if len(picked) >= self.top_n:
+                break
+        return picked
+
+    def _key(self, combo: StyleCombination, weather: Dict[str, Any]) -> str:
+        return self.service.preference_key(
+            list(combo.style_prefs), combo.budget, combo.occasion, list(combo.colors), combo.gender, weather, combo.language
+        )
+
+    async def _resolve_images(self, result: Dict[str, Any], gender: str) -> int:
+        from app.api.placeholder import warm_product
+
+        # 이미지 URL에는 gender가 없고 프론트엔드가 &gender=를 붙이므로 그 값으로 캐시 키를 맞춤
+        image_gender = _image_gender(gender)
+        lookups = []
+        for outfit in result.get("outfits", []):
+            for item in outfit.get("items", []):
+                url = urllib.parse.urlsplit(item.get("image_url") or "")
+                if url.path != PLACEHOLDER_IMAGE_PATH:
+                    continue
+                params = urllib.parse.parse_qs(url.query)
+                lookups.append(warm_product(
+                    params.get("text", ["Item"])[0],
+                    params.get("brand", [""])[0],
+                    params.get("gender", [image_gender])[0],
+                ))
+        found = await asyncio.gather(*lookups, return_exceptions=True)
+        return sum(1 for f in found if f is True)
+
+    async def warm_one(self, combo: StyleCombination, weather: Dict[str, Any]) -> str:
+        """Generate and cache one combination unless it is already cached."""
+        if await style_cache.size(self._key(combo, weather)) > 0:
+            self.skipped += 1
+            return "skipped"
+        try:
+            with prefetch_priority():
+                result = await self.service.recommend_style(
+                    style_prefs=list(combo.style_prefs),
+                    budget=combo.budget,
+                    occasion=combo.occasion,
+                    colors=list(combo.colors),
+                    gender=combo.gender,
+                    weather=weather,
+                    language=combo.language,
+                )
+                self.images_resolved += await self._resolve_images(result, combo.gender)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"[style_warmer] {combo} failed: {e}")
+            return "failed"
+        self.generated += 1
+        return "generated"
+
+    async def run_once(self) -> Dict[str, int]:
+        weather = await self._weather()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _bounded(combo: StyleCombination) -> str:
+            async with semaphore:
+                return await self.warm_one(combo, weather)
+
+        outcomes = await asyncio.gather(*[_bounded(c) for c in self.combinations(weather)])
+        summary = dict(Counter(outcomes))
+        self.runs += 1
+        self.last_run = summary
+        logger.info(f"[style_warmer] run {self.runs}: {summary}")
+        return summary
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"[style_warmer] run failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = STYLE_WARM_INTERVAL) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "runs": self.runs,
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "images_resolved": self.images_resolved,
+            "tracked_combinations": len(self._counts),
+            "last_run": self.last_run,
+        }
+
+
+style_warmer = StyleWarmer()
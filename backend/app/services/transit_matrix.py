@@ -0,0 +1,133 @@
+"""
+Precomputed store-to-store transit matrix.
+
+Built offline by `scripts/build_transit_matrix.py` from the curated stores in
+app/data/stores.json and loaded memory-mapped at startup, so legs between two known stores
+are answered without calling ODsay. Files:
+- transit_matrix.npy  : (n, n) structured array of (duration_min, method code, payment)
+- transit_matrix.json : store ids and coordinates in matrix order, plus build metadata
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+MATRIX_PATH = DATA_DIR / "transit_matrix.npy"
+META_PATH = DATA_DIR / "transit_matrix.json"
+
+LEG_DTYPE = np.dtype([("duration", "<i2"), ("method", "u1"), ("payment", "<i4")])
+# duration 값이 MISSING이면 빌드 시 조회 실패 → 런타임에 ODsay로 조회
+MISSING = -1
+
+METHODS = ["Unknown", "Subway", "Bus", "Bus+Subway", "Walking/Taxi"]
+_METHOD_CODES = {m: i for i, m in enumerate(METHODS)}
+
+
+# 좌표 → 행 인덱스 키 정밀도. 매장 좌표는 카탈로그 값 그대로 조회되므로 ~0.1m 단위로 구분
+MATRIX_KEY_PRECISION = 6
+
+
+def _coord_key(lat: float, lng: float, precision: int) -> Tuple[float, float]:
+    return (round(lat, precision), round(lng, precision))
+
+
+def build_index(coords: Sequence[Tuple[float, float]], precision: int = MATRIX_KEY_PRECISION) -> Tuple[Dict[Tuple[float, float], int], List[int]]:
+    """
+    Coordinate key → matrix row. Rows whose key collides with another store's are left out
+    (returned as the second value), so legs touching them fall back to live ODsay lookups
+    instead of silently answering for the wrong store.
+    """
+    rows: Dict[Tuple[float, float], List[int]] = {}
+    for i, (lat, lng) in enumerate(coords):
+        rows.setdefault(_coord_key(lat, lng, precision), []).append(i)
+    index = {key: r[0] for key, r in rows.items() if len(r) == 1}
+    collisions = sorted(i for r in rows.values() if len(r) > 1 for i in r)
+    return index, collisions
+
+
+def encode_leg(leg: Optional[Dict[str, Any]]) -> Tuple[int, int, int]:
+    """ODsayService leg dict → matrix record. None (not cacheable) → MISSING."""
+    if leg is None:
+        return (MISSING, 0, 0)
+    return (
+        int(leg["duration_min"]),
+        _METHOD_CODES.get(leg["method"], 0),
+        int(leg.get("payment", 0) or 0),
+    )
+
+
+def decode_leg(record) -> Dict[str, Any]:
+    duration, method_code, payment = int(record["duration"]), int(record["method"]), int(record["payment"])
+    method = METHODS[method_code] if method_code < len(METHODS) else "Unknown"
+    if method == "Walking/Taxi":
+        summary = "No direct transit found"
+    else:
+        summary = f"{method}, approx {duration} mins, {payment} KRW"
+    return {"method": method, "duration_min": duration, "odsay_summary": summary}
+
+
+def save_matrix(
+    records: np.ndarray,
+    ids: Sequence[str],
+    coords: Sequence[Tuple[float, float]],
+    matrix_path: Path = MATRIX_PATH,
+    meta_path: Path = META_PATH,
+    **metadata: Any,
+) -> None:
+    np.save(matrix_path, records.astype(LEG_DTYPE))
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"ids": list(ids), "coords": [list(c) for c in coords], **metadata}, f, ensure_ascii=False, indent=2)
+
+
+class TransitMatrix:
+    def __init__(self, precision: int = MATRIX_KEY_PRECISION):
+        self.precision = precision
+        self._records: Optional[np.ndarray] = None
+        self._index: Dict[Tuple[float, float], int] = {}
+        self.ids: List[str] = []
+        self.hits = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._records is not None
+
+    def load(self, matrix_path: Path = MATRIX_PATH, meta_path: Path = META_PATH) -> bool:
+        if not Path(matrix_path).exists() or not Path(meta_path).exists():
+            logger.info("Transit matrix not found; store-to-store legs will use ODsay")
+            return False
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        records = np.load(matrix_path, mmap_mode="r")
+        n = len(meta["ids"])
+        if records.dtype != LEG_DTYPE or records.shape != (n, n):
+            logger.warning(f"Transit matrix shape/dtype mismatch ({records.shape}, {records.dtype}); ignoring")
+            return False
+
+        self._records = records
+        self.ids = meta["ids"]
+        self._index, collisions = build_index(meta["coords"], self.precision)
+        if collisions:
+            logger.warning(
+                f"Transit matrix: {len(collisions)} stores share coordinates with another store; "
+                f"their legs use ODsay ({', '.join(self.ids[i] for i in collisions)})"
+            )
+        logger.info(f"Transit matrix loaded: {n}x{n} ({meta.get('built_at', 'unknown build')})")
+        return True
+
+    def lookup(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> Optional[Dict[str, Any]]:
+        if self._records is None:
+            return None
+        i = self._index.get(_coord_key(start_lat, start_lng, self.precision))
+        j = self._index.get(_coord_key(end_lat, end_lng, self.precision))
+        if i is None or j is None or i == j:
+            return None
+        record = self._records[i, j]
+        if record["duration"] == MISSING:
+            return None
+        self.hits += 1
+        return decode_leg(record)
@@ -0,0 +1,198 @@
+"""
+Content-addressed cache for virtual try-on results.
+
+A generated image is stored on disk under the SHA-256 of the decoded user photo plus the
+normalized outfit (item name, type and the SHA-256 of the product image that was sent to
+Gemini), so the same photo + same garments never costs a second generation. Files are
+evicted least-recently-used once the directory exceeds TRYON_CACHE_MAX_BYTES; hits touch
+the file's mtime so the LRU order survives restarts.
+
+Because the content key needs the product images, a second key built only from the request
+(photo hash + item name/type/brand) is mapped to the content key in the SQLite cache. A
+re-tap of "try on" resolves through that alias without searching or downloading anything.
+"""
+import os
+import base64
+import asyncio
+import hashlib
+import json
+import logging
+import binascii
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from app.utils.persistent_cache import CACHE_DIR, get_persistent_cache
+
+logger = logging.getLogger(__name__)
+
+TRYON_CACHE_DIR = Path(os.getenv("TRYON_CACHE_DIR", CACHE_DIR / "tryon"))
+TRYON_CACHE_MAX_BYTES = int(os.getenv("TRYON_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TRYON_ALIAS_TTL = int(os.getenv("TRYON_ALIAS_TTL", str(7 * 86400)))
+
+
+def _norm(value: Any) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def user_image_hash(image_b64: Union[str, bytes, bytearray]) -> Optional[str]:
+    """SHA-256 of the decoded photo (data-URL header and whitespace ignored); None if undecodable."""
+    if isinstance(image_b64, (bytes, bytearray)):
+        # 업로드 엔드포인트는 디코딩된 바이트를 그대로 전달
+        return hashlib.sha256(image_b64).hexdigest() if image_b64 else None
+    if "base64," in image_b64:
+        image_b64 = image_b64.split("base64,")[1]
+    try:
+        data = base64.b64decode("".join(image_b64.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def request_key(user_hash: str, outfit_items: List[Dict[str, Any]]) -> str:
+    items = sorted(
+        (_norm(item.get("name")), _norm(item.get("type")), _norm(item.get("store_name") or item.get("brand")))
+        for item in outfit_items
+    )
+    return _digest({"user": user_hash, "items": items})
+
+
+def content_key(user_hash: str, outfit_items: List[Dict[str, Any]], product_images: List[Dict[str, Any]]) -> str:
+    image_hashes = {pi["name"]: hashlib.sha256(pi["bytes"]).hexdigest() for pi in product_images}
+    items = sorted(
+        (_norm(item.get("name")), _norm(item.get("type")), image_hashes.get(item.get("name", "")))
+        for item in outfit_items
+    )
+    return _digest({"user": user_hash, "items": items})
+
+
+class TryOnResultCache:
+    def __init__(self, directory: Path = TRYON_CACHE_DIR, max_bytes: int = TRYON_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._aliases = get_persistent_cache("tryon_alias", ttl=TRYON_ALIAS_TTL)
+        # content key → 파일 크기, 오래 사용하지 않은 순서
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        # 파일 입출력은 스레드에서 실행되므로 인덱스 변경은 lock 안에서
+        self._lock = threading.RLock()
+        # metrics
+        self.hits = 0
+        self.alias_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.img"
+
+    def _load(self) -> None:
+        """Rebuild the LRU index from the files on disk (oldest mtime first)."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.directory.exists():
+                return
+            entries = []
+            for path in self.directory.glob("*/*.img"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path.stem, st.st_size))
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._bytes += size
+            self._evict()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._load()
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                # 다른 워커가 삭제함
+                self._bytes -= self._index.pop(key, 0)
+                return None
+            self._index.move_to_end(key)
+            return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self._bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            while self._index and self._bytes > self.max_bytes:
+                key, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    self._path(key).unlink()
+                except OSError:
+                    pass
+
+    async def lookup(self, req_key: str) -> Optional[str]:
+        """Cached result (base64) for a request seen before, without touching product images."""
+        found, key = await self._aliases.get(req_key)
+        if not found or not key:
+            return None
+        data = await asyncio.to_thread(self._read, key)
+        if data is None:
+            return None
+        self.alias_hits += 1
+        return base64.b64encode(data).decode("utf-8")
+
+    async def get(self, key: str) -> Optional[str]:
+        data = await asyncio.to_thread(self._read, key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return base64.b64encode(data).decode("utf-8")
+
+    async def put(self, key: str, image_b64: str, req_key: Optional[str] = None) -> None:
+        try:
+            await asyncio.to_thread(self._write, key, base64.b64decode(image_b64))
+        except (OSError, binascii.Error) as e:
+            logger.warning(f"[tryon_cache] store failed: {e}")
+            return
+        self.stored += 1
+        if req_key:
+            await self._aliases.set(req_key, key)
+
+    async def alias(self, req_key: str, key: str) -> None:
+        await self._aliases.set(req_key, key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "alias_hits": self.alias_hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+tryon_cache = TryOnResultCache()
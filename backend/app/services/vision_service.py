@@ -6,13 +6,13 @@ and extract a unified UserStyleProfile.
 API key is loaded from environment variable GOOGLE_API_KEY (never hardcoded).
 """
 import os
-import io
-import base64
+import asyncio
 import logging
 import json
-from typing import List, Dict, Any, Optional
-from PIL import Image
+from typing import List, Dict, Any, Optional, Union
 import google.generativeai as genai
+from app.utils.bounded_executor import gemini_executor
+from app.utils.image_prep import prepare_image, ANALYSIS_MAX_EDGE
 
 logger = logging.getLogger(__name__)
 
@@ -24,27 +24,12 @@ class VisionService:
             genai.configure(api_key=self.api_key)
         self.model_name = "gemini-2.0-flash"
 
-    def _decode_image(self, image_b64: str) -> Image.Image:
-        """Decode a base64-encoded image string into a PIL Image."""
-        if "base64," in image_b64:
-            image_b64 = image_b64.split("base64,")[1]
-        image_data = base64.b64decode(image_b64)
-        return Image.open(io.BytesIO(image_data))
-
-    def _resize_image(self, img: Image.Image, max_size: int = 1024) -> Image.Image:
-        """Resize image to fit within max_size while maintaining aspect ratio."""
-        if max(img.size) > max_size:
-            ratio = max_size / max(img.size)
-            new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-            img = img.resize(new_size, Image.LANCZOS)
-        return img
-
-    async def analyze_ootd_batch(self, images_b64: List[str], language: str = "en") -> Dict[str, Any]:
+    async def analyze_ootd_batch(self, images_b64: List[Union[str, bytes]], language: str = "en") -> Dict[str, Any]:
         """
         Analyze a batch of OOTD images to extract a unified UserStyleProfile.
         
         Args:
-            images_b64: List of base64-encoded image strings
+            images_b64: List of base64-encoded image strings or raw image bytes
             language: Language code for the response
             
         Returns:
@@ -56,25 +41,27 @@ class VisionService:
         if not images_b64:
             raise ValueError("No images provided for analysis.")
 
-        # Decode and resize all images
-        pil_images = []
-        for i, img_b64 in enumerate(images_b64[:10]):  # Max 10 images
-            try:
-                img = self._decode_image(img_b64)
-                img = self._resize_image(img)
-                if img.mode == "RGBA":
-                    img = img.convert("RGB")
-                pil_images.append(img)
-            except Exception as e:
-                logger.warning(f"Failed to decode image {i}: {e}")
+        # Gemini 풀이 가득 찼으면 이미지 디코딩 전에 거절
+        gemini_executor.check_admission()
+
+        # Decode, EXIF-rotate, resize and re-encode all images (in the preprocessing pool)
+        prepared = await asyncio.gather(
+            *[prepare_image(img_b64, max_edge=ANALYSIS_MAX_EDGE) for img_b64 in images_b64[:10]],  # Max 10 images
+            return_exceptions=True,
+        )
+        image_parts = []
+        for i, img in enumerate(prepared):
+            if isinstance(img, Exception):
+                logger.warning(f"Failed to decode image {i}: {img}")
                 continue
+            image_parts.append(img.as_part())
 
-        if not pil_images:
+        if not image_parts:
             raise ValueError("No valid images could be processed.")
 
         lang_instruction = "한국어로 답변해주세요." if language == "ko" else f"Respond in {language}."
 
-        prompt = f"""You are an expert K-fashion stylist AI. Analyze ALL of the following {len(pil_images)} OOTD (Outfit of the Day) photos.
+        prompt = f"""You are an expert K-fashion stylist AI. Analyze ALL of the following {len(image_parts)} OOTD (Outfit of the Day) photos.
 
 Your task: Find the COMMON PATTERNS across all photos to build a unified style profile of the person.
 
@@ -103,13 +90,16 @@ Return ONLY the JSON. No markdown, no code blocks, no explanation."""
             model = genai.GenerativeModel(self.model_name)
 
             # Build content: prompt + all images
-            content_parts = [prompt] + pil_images
-
-            response = model.generate_content(
-                content_parts,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.3,
-                    max_output_tokens=1024,
+            content_parts = [prompt] + image_parts
+
+            # generate_content is blocking; run it on the dedicated Gemini pool, not the event loop
+            response = await gemini_executor.run(
+                lambda: model.generate_content(
+                    content_parts,
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=0.3,
+                        max_output_tokens=1024,
+                    )
                 )
             )
 
@@ -1,12 +1,16 @@
 import os
-import httpx
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-from app.utils.cache import cache
+from app.utils.cache import get_cache
+from app.utils.http_client import http_clients
+from app.utils.singleflight import get_singleflight
 
 logger = logging.getLogger(__name__)
 
+weather_cache = get_cache("weather", max_entries=16, default_ttl=3600)
+weather_flight = get_singleflight("weather")
+
 class WeatherService:
     def __init__(self):
         self.openweather_api_key = os.getenv("OPENWEATHER_API_KEY")
@@ -17,10 +21,14 @@ class WeatherService:
 
     async def get_seoul_weather(self) -> Dict[str, Any]:
         # Check cache
-        cached_weather = cache.get(self.cache_key)
+        cached_weather = weather_cache.get(self.cache_key)
         if cached_weather:
             return cached_weather
 
+        # 캐시 만료 시점에 동시 요청이 몰려도 외부 API는 한 번만 호출
+        return await weather_flight.do(self.cache_key, self._fetch_and_cache)
+
+    async def _fetch_and_cache(self) -> Dict[str, Any]:
         # Try OpenWeatherMap
         weather = await self._get_from_openweather()
         
@@ -38,7 +46,7 @@ class WeatherService:
             }
 
         # Cache result
-        cache.set(self.cache_key, weather, self.cache_ttl)
+        weather_cache.set(self.cache_key, weather, self.cache_ttl)
         return weather
 
     async def _get_from_openweather(self) -> Optional[Dict[str, Any]]:
@@ -54,16 +62,16 @@ class WeatherService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, timeout=5.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                return {
-                    "temp": int(data["main"]["temp"]),
-                    "condition": data["weather"][0]["main"],
-                    "humidity": data["main"]["humidity"]
-                }
+            client = http_clients.get(url)
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            
+            return {
+                "temp": int(data["main"]["temp"]),
+                "condition": data["weather"][0]["main"],
+                "humidity": data["main"]["humidity"]
+            }
         except Exception as e:
             logger.error(f"OpenWeather API failed: {e}")
             return None
@@ -77,21 +85,21 @@ class WeatherService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, timeout=5.0)
-                response.raise_for_status()
-                data = response.json()
-                current = data["current"]
-                
-                # Convert WMO weather code to text condition
-                weather_code = current["weather_code"]
-                condition = self._map_wmo_code(weather_code)
-
-                return {
-                    "temp": int(current["temperature_2m"]),
-                    "condition": condition,
-                    "humidity": current["relative_humidity_2m"]
-                }
+            client = http_clients.get(url)
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            current = data["current"]
+            
+            # Convert WMO weather code to text condition
+            weather_code = current["weather_code"]
+            condition = self._map_wmo_code(weather_code)
+
+            return {
+                "temp": int(current["temperature_2m"]),
+                "condition": condition,
+                "humidity": current["relative_humidity_2m"]
+            }
         except Exception as e:
             logger.error(f"Open-Meteo API failed: {e}")
             return None
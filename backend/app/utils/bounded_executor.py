@@ -0,0 +1,147 @@
+"""
+Dedicated, bounded thread pool for blocking SDK calls (Gemini).
+
+The Gemini SDK is synchronous and a call takes seconds to a minute, so running it on the
+default executor (shared with everything else) or on the event loop stalls unrelated work.
+`BoundedExecutor` gives those calls their own `workers` threads plus a queue of at most
+`max_queue` waiting calls; beyond that `run()` fails fast with `ExecutorSaturatedError`
+(the API answers 503) instead of letting requests pile up behind minute-long generations.
+Queue wait and run time are recorded for `/api/metrics`.
+
+    result = await gemini_executor.run(gemini_service.style_edit, image, command, language)
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+GEMINI_EXECUTOR_WORKERS = int(os.getenv("GEMINI_EXECUTOR_WORKERS", "4"))
+GEMINI_EXECUTOR_QUEUE = int(os.getenv("GEMINI_EXECUTOR_QUEUE", "8"))
+
+# 대기 시간 백분위 계산에 쓰는 최근 호출 수
+WAIT_WINDOW = 500
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(Exception):
+    """All workers are busy and the wait queue is full."""
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))]
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        # metrics
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_WINDOW)
+        self._runs: Deque[float] = deque(maxlen=WAIT_WINDOW)
+
+    @property
+    def saturated(self) -> bool:
+        return self._active + self._queued >= self.workers + self.max_queue
+
+    def check_admission(self) -> None:
+        """Raise ExecutorSaturatedError now if a new call would be rejected (cheap pre-check)."""
+        if self.saturated:
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorSaturatedError(f"{self.name}: {self._active} running, {self._queued} queued")
+
+    async def run(self, fn: Callable[..., T], *args: Any, admission: bool = True) -> T:
+        """
+        Run `fn(*args)` on the pool. With admission=False the call waits for a slot even
+        when the queue is full (background jobs that are already rate-limited upstream).
+        """
+        with self._lock:
+            if admission and self.saturated:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name}: {self._active} running, {self._queued} queued")
+            self._queued += 1
+            self.submitted += 1
+        enqueued = time.perf_counter()
+        # 대기 중에 호출자가 취소되면 스레드에서 실행하지 않음
+        state = {"started": False, "abandoned": False}
+
+        def _call() -> T:
+            started = time.perf_counter()
+            with self._lock:
+                if state["abandoned"]:
+                    raise asyncio.CancelledError()
+                state["started"] = True
+                self._queued -= 1
+                self._active += 1
+                self._waits.append(started - enqueued)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._runs.append(time.perf_counter() - started)
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, _call)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    self._queued -= 1
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            runs = sorted(self._runs)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queue_wait_ms": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "p50": round(_percentile(waits, 0.50) * 1000, 1),
+                    "p95": round(_percentile(waits, 0.95) * 1000, 1),
+                    "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+                },
+                "run_ms": {
+                    "avg": round(sum(runs) / len(runs) * 1000, 1) if runs else 0.0,
+                    "p95": round(_percentile(runs, 0.95) * 1000, 1),
+                },
+            }
+
+
+gemini_executor = BoundedExecutor("gemini", GEMINI_EXECUTOR_WORKERS, GEMINI_EXECUTOR_QUEUE)
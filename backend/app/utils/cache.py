@@ -1,33 +1,166 @@
+"""
+Bounded in-memory LRU + TTL cache.
+
+Each namespace (weather, placeholder images, product info, ...) gets its own instance with
+max-entries / max-bytes limits. Expired entries are dropped on read and by a background
+sweep, and least-recently-used entries are evicted once a limit is hit, so memory stays flat
+on long-running workers.
+"""
+import sys
 import time
-from typing import Any, Optional, Dict
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough byte size of a cached value (containers are walked one level deep)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
 
 class TTLCache:
-    def __init__(self):
-        self._cache: Dict[str, Any] = {}
-        self._expiry: Dict[str, float] = {}
-
-    def set(self, key: str, value: Any, ttl: int) -> None:
-        self._cache[key] = value
-        self._expiry[key] = time.time() + ttl
-
-    def get(self, key: str) -> Optional[Any]:
-        if key not in self._cache:
-            return None
-        
-        if time.time() > self._expiry[key]:
-            self.pud(key)
-            return None
-            
-        return self._cache[key]
-    
-    def pud(self, key: str) -> None:
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expiry:
-            del self._expiry[key]
+    def __init__(
+        self,
+        namespace: str = "default",
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        default_ttl: int = 3600,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # key -> (value, expires_at, size); 순서 = LRU (앞쪽이 가장 오래된 항목)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+        self._evict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if time.monotonic() > entry[1]:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
 
     def clear(self) -> None:
-        self._cache.clear()
-        self._expiry.clear()
+        self._entries.clear()
+        self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop every expired entry. Returns the number removed."""
+        now = time.monotonic()
+        expired = [k for k, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+_caches: Dict[str, TTLCache] = {}
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+def get_cache(namespace: str, **limits: Any) -> TTLCache:
+    """Return the cache for `namespace`, creating it with `limits` on first use."""
+    if namespace not in _caches:
+        _caches[namespace] = TTLCache(namespace=namespace, **limits)
+    return _caches[namespace]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: c.stats() for name, c in _caches.items()}
+
+
+async def _sweep_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for c in list(_caches.values()):
+            removed = c.sweep()
+            if removed:
+                logger.debug(f"[cache] {c.namespace}: swept {removed} expired entries")
+
+
+def start_sweeper(interval: float = 60.0) -> None:
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_loop(interval))
+
+
+async def stop_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+
 
-cache = TTLCache()
+cache = get_cache("default")
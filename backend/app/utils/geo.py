@@ -0,0 +1,29 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# 도보 속도 (m/분) - 도보 시간 추정용
+WALK_METERS_PER_MIN = 80
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two WGS84 points, in kilometers."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_array(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized haversine_km from one point to arrays of points."""
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dl = np.radians(lngs - lng)
+    a = np.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def walk_minutes(distance_km: float) -> int:
+    return max(1, round(distance_km * 1000 / WALK_METERS_PER_MIN))
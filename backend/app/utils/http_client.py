@@ -0,0 +1,159 @@
+"""
+Shared outbound HTTP client registry.
+
+Every known upstream host gets one pooled httpx.AsyncClient (keep-alive, connection caps,
+per-host timeouts, HTTP/2 when `h2` is installed) that lives for the whole app lifespan,
+so service calls reuse warm TCP/TLS connections instead of handshaking per request.
+Any other host (product image CDNs, stub servers) shares a single default client, so the
+registry and its open connections stay bounded however many hosts are contacted.
+"""
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (optional: enables HTTP/2 via httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HostConfig:
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    max_connections: int = 10
+    max_keepalive: int = 5
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    follow_redirects: bool = False
+
+
+# Known upstreams. Anything else (e.g. product image CDNs) shares one client with DEFAULT_HOST_CONFIG.
+HOST_CONFIGS: Dict[str, HostConfig] = {
+    "openapi.naver.com": HostConfig(timeout=5.0, max_connections=20, max_keepalive=10),
+    "api.odsay.com": HostConfig(timeout=5.0, max_connections=10, max_keepalive=5),
+    "api.openweathermap.org": HostConfig(timeout=5.0, max_connections=4, max_keepalive=2),
+    "api.open-meteo.com": HostConfig(timeout=5.0, max_connections=4, max_keepalive=2),
+}
+
+# 연결 수 제한은 기본 클라이언트를 공유하는 모든 호스트 합계
+DEFAULT_HOST_CONFIG = HostConfig(timeout=15.0, max_connections=20, max_keepalive=10, follow_redirects=True)
+# 알 수 없는 호스트가 공유하는 클라이언트/통계 키
+DEFAULT_CLIENT_KEY = "default"
+
+
+class _HostStats:
+    def __init__(self):
+        self.clients_opened = 0
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.total_latency_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        pool_hits = max(self.requests - self.connections_opened, 0)
+        return {
+            "clients_opened": self.clients_opened,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "pool_hits": pool_hits,
+            "pool_hit_ratio": round(pool_hits / self.requests, 3) if self.requests else 0.0,
+            "avg_latency_ms": round(self.total_latency_ms / self.requests, 1) if self.requests else 0.0,
+        }
+
+
+class HTTPClientRegistry:
+    def __init__(
+        self,
+        configs: Optional[Dict[str, HostConfig]] = None,
+        default_config: HostConfig = DEFAULT_HOST_CONFIG,
+    ):
+        self._configs = configs if configs is not None else HOST_CONFIGS
+        self._default_config = default_config
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _HostStats] = {}
+        self._ssl_context = None
+
+    @staticmethod
+    def _host_of(url_or_host: str) -> str:
+        if "://" in url_or_host:
+            return urlsplit(url_or_host).hostname or url_or_host
+        return url_or_host
+
+    def _build_client(self, host: str) -> httpx.AsyncClient:
+        config = self._configs.get(host, self._default_config)
+        stats = self._stats.setdefault(host, _HostStats())
+        stats.clients_opened += 1
+
+        # SSL context 생성 비용이 크므로 모든 호스트가 하나를 공유
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+
+        async def _trace(event: str, info: Dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+            elif event == "connection.start_tls.complete":
+                stats.tls_handshakes += 1
+
+        async def _on_request(request: httpx.Request) -> None:
+            stats.requests += 1
+            request.extensions["trace"] = _trace
+            request.extensions["kfit_started"] = time.perf_counter()
+
+        async def _on_response(response: httpx.Response) -> None:
+            started = response.request.extensions.get("kfit_started")
+            if started is not None:
+                stats.total_latency_ms += (time.perf_counter() - started) * 1000
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=config.http2 and HTTP2_AVAILABLE,
+            follow_redirects=config.follow_redirects,
+            verify=self._ssl_context,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
+        )
+
+    def get(self, url_or_host: str) -> httpx.AsyncClient:
+        """
+        Return the pooled client for the host of `url_or_host`, creating it on first use.
+        Hosts without a HostConfig all get the shared default client.
+        """
+        host = self._host_of(url_or_host)
+        if host not in self._configs:
+            host = DEFAULT_CLIENT_KEY
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = self._build_client(host)
+            self._clients[host] = client
+        return client
+
+    def start(self) -> None:
+        """Pre-build clients for the known upstreams so the first request doesn't pay setup cost."""
+        for host in self._configs:
+            self.get(host)
+        logger.info(f"HTTP client registry started ({len(self._clients)} hosts, http2={HTTP2_AVAILABLE})")
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {host: s.as_dict() for host, s in self._stats.items()}
+
+
+http_clients = HTTPClientRegistry()
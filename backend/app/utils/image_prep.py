@@ -0,0 +1,179 @@
+"""
+Preprocessing for photos sent to Gemini.
+
+Phone uploads arrive as multi-megabyte base64 JPEG/HEIC-converted files with EXIF rotation
+and metadata. `prepare_image()` applies the EXIF orientation, downsizes to a max edge,
+drops alpha and metadata and re-encodes as JPEG (or WebP) at a tuned quality, so Gemini
+receives a few hundred KB instead of several MB. The decode / resize / encode work runs in
+a small process pool (IMAGE_PREP_WORKERS, 0 = a thread instead) so it neither blocks the
+event loop nor competes for the GIL with request handling.
+
+    part = await prepare_image(user_image_b64, max_edge=TRYON_MAX_EDGE)
+    contents = [prompt, part.as_part()]
+"""
+import io
+import os
+import base64
+import asyncio
+import logging
+import binascii
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREP_WORKERS = int(os.getenv("IMAGE_PREP_WORKERS", "2"))
+IMAGE_PREP_FORMAT = os.getenv("IMAGE_PREP_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_PREP_QUALITY = int(os.getenv("IMAGE_PREP_QUALITY", "88"))
+
+# 용도별 최대 변 길이 (px)
+TRYON_MAX_EDGE = int(os.getenv("IMAGE_PREP_TRYON_MAX_EDGE", "1536"))
+PRODUCT_MAX_EDGE = int(os.getenv("IMAGE_PREP_PRODUCT_MAX_EDGE", "1024"))
+ANALYSIS_MAX_EDGE = int(os.getenv("IMAGE_PREP_ANALYSIS_MAX_EDGE", "1024"))
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class InvalidImageError(ValueError):
+    """The input could not be decoded as an image (the API answers 400)."""
+
+    def __init__(self, message: str = "Invalid image format"):
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+
+    def as_part(self) -> Dict[str, Any]:
+        """Inline blob for `GenerativeModel.generate_content` contents."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def decode_base64_image(image_b64: str) -> bytes:
+    # Remove header if present (e.g., "data:image/jpeg;base64,")
+    if "base64," in image_b64:
+        image_b64 = image_b64.split("base64,")[1]
+    try:
+        return base64.b64decode(image_b64)
+    except (binascii.Error, ValueError):
+        raise InvalidImageError()
+
+
+def _verify_sync(image: Union[str, bytes]) -> bytes:
+    data = decode_base64_image(image) if isinstance(image, str) else image
+    try:
+        # 헤더/구조만 확인 (픽셀 디코딩 없음)
+        Image.open(io.BytesIO(data)).verify()
+    except Exception:
+        raise InvalidImageError()
+    return data
+
+
+async def verify_image(image: Union[str, bytes]) -> bytes:
+    """Decode base64 if needed and check the image header cheaply; raw bytes or InvalidImageError."""
+    return await asyncio.to_thread(_verify_sync, image)
+
+
+def _prepare_sync(data: bytes, max_edge: int, fmt: str, quality: int) -> PreparedImage:
+    """Decode → EXIF transpose → downsize → RGB → re-encode without metadata. Runs in the pool."""
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        raise InvalidImageError()
+
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    # 투명 배경은 흰색으로 합성 (JPEG은 alpha 미지원)
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    fmt = fmt if fmt in _MIME_TYPES else "JPEG"
+    out = io.BytesIO()
+    # 새 이미지로 저장하므로 EXIF/ICC 등 메타데이터는 포함되지 않음
+    if fmt == "WEBP":
+        img.save(out, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return PreparedImage(out.getvalue(), _MIME_TYPES[fmt], img.width, img.height, len(data))
+
+
+class ImagePreprocessor:
+    def __init__(self, workers: int = IMAGE_PREP_WORKERS, fmt: str = IMAGE_PREP_FORMAT, quality: int = IMAGE_PREP_QUALITY):
+        self.workers = max(0, workers)
+        self.fmt = fmt
+        self.quality = quality
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # metrics
+        self.processed = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # fork는 이벤트 루프/SQLite/HTTP 스레드까지 복제하므로 spawn 사용
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def prepare(self, image: Union[str, bytes], max_edge: int) -> PreparedImage:
+        """`image` is base64 (optionally a data URL) or raw bytes. Raises InvalidImageError if not an image."""
+        data = decode_base64_image(image) if isinstance(image, str) else image
+        try:
+            if self.workers:
+                try:
+                    prepared = await asyncio.get_running_loop().run_in_executor(
+                        self._get_pool(), _prepare_sync, data, max_edge, self.fmt, self.quality
+                    )
+                except BrokenProcessPool:
+                    logger.warning("[image_prep] process pool broken, restarting")
+                    self._pool = None
+                    prepared = await asyncio.to_thread(_prepare_sync, data, max_edge, self.fmt, self.quality)
+            else:
+                prepared = await asyncio.to_thread(_prepare_sync, data, max_edge, self.fmt, self.quality)
+        except ValueError:
+            self.failed += 1
+            raise
+        self.processed += 1
+        self.bytes_in += prepared.original_bytes
+        self.bytes_out += len(prepared.data)
+        return prepared
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "format": self.fmt,
+            "quality": self.quality,
+            "processed": self.processed,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "reduction": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+        }
+
+
+image_preprocessor = ImagePreprocessor()
+
+
+async def prepare_image(image: Union[str, bytes], max_edge: int = TRYON_MAX_EDGE) -> PreparedImage:
+    return await image_preprocessor.prepare(image, max_edge)
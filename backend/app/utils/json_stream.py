@@ -0,0 +1,72 @@
+"""
+Incremental parser for a JSON object arriving in chunks (e.g. a streamed LLM completion).
+
+Feeds text as it arrives and reports top-level values as soon as they are complete, without
+re-parsing the whole buffer. Elements of the arrays named in `stream_arrays` are reported
+one by one, so `{"outfits": [{...}, {...}]}` yields each outfit when its closing brace arrives.
+
+    parser = JSONObjectStreamParser(stream_arrays={"outfits"})
+    for key, value in parser.feed(chunk):
+        ...  # ("trend_analysis", {...}), ("outfits", {...first outfit...}), ...
+"""
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class JSONObjectStreamParser:
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = set(stream_arrays)
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None  # depth 1에서 마지막으로 끝난 문자열 (키 후보)
+        self._key: Optional[str] = None  # 현재 top-level 키
+        self._value_start = -1
+        self._streaming = False  # 현재 값이 stream_arrays 배열인지
+        self._element_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Append `chunk`; returns (key, value) pairs completed by it, in order."""
+        self.buffer += chunk
+        events: List[Tuple[str, Any]] = []
+        buf = self.buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start < 0:
+                        self._last_string = json.loads(buf[self._string_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2:
+                    self._value_start = i
+                    self._streaming = ch == "[" and self._key in self.stream_arrays
+                elif self._depth == 3 and self._streaming:
+                    self._element_start = i
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._streaming and self._element_start >= 0:
+                    events.append((self._key, json.loads(buf[self._element_start:i + 1])))
+                    self._element_start = -1
+                elif self._depth == 1:
+                    if not self._streaming:
+                        events.append((self._key, json.loads(buf[self._value_start:i + 1])))
+                    self._value_start = -1
+                    self._streaming = False
+        self._pos = len(buf)
+        return events
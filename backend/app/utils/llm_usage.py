@@ -0,0 +1,126 @@
+"""
+Token and latency accounting for LLM calls.
+
+Every OpenAI chat completion is recorded under the endpoint that made it (prompt /
+completion / cached-prompt tokens, latency, model), and `report()` summarizes tokens per
+request and latency percentiles per endpoint for `/api/metrics/llm`, so prompt growth
+and latency regressions show up as numbers instead of bills.
+"""
+import time
+import logging
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 엔드포인트별 지연 시간 백분위 계산에 쓰는 최근 호출 수
+LATENCY_WINDOW = 500
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _EndpointUsage:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.models: Counter = Counter()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def summary(self) -> Dict[str, Any]:
+        ok = self.calls - self.errors
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "models": dict(self.models),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / ok, 1) if ok else 0.0,
+            "avg_completion_tokens": round(self.completion_tokens / ok, 1) if ok else 0.0,
+            "prompt_cache_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+                "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            },
+        }
+
+
+class LLMUsageTracker:
+    def __init__(self):
+        self._endpoints: Dict[str, _EndpointUsage] = {}
+
+    def _get(self, endpoint: str) -> _EndpointUsage:
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = _EndpointUsage()
+        return self._endpoints[endpoint]
+
+    def record(self, endpoint: str, model: str, usage: Optional[Any], latency: float) -> None:
+        """Record one successful call. `usage` is the OpenAI `CompletionUsage` (may be None)."""
+        stats = self._get(endpoint)
+        stats.calls += 1
+        stats.models[model] += 1
+        stats.latencies.append(latency)
+
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        stats.prompt_tokens += prompt
+        stats.completion_tokens += completion
+        stats.cached_tokens += cached
+        logger.info(
+            f"[llm] {endpoint} {model}: prompt={prompt} (cached {cached}) "
+            f"completion={completion} {latency * 1000:.0f}ms"
+        )
+
+    def record_error(self, endpoint: str, model: str, latency: float) -> None:
+        stats = self._get(endpoint)
+        stats.calls += 1
+        stats.errors += 1
+        stats.models[model] += 1
+        stats.latencies.append(latency)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: usage.summary() for name, usage in self._endpoints.items()}
+
+
+llm_usage = LLMUsageTracker()
+
+
+class track_llm_call:
+    """
+    Times a call and records it on exit:
+
+        with track_llm_call("style_adjust", model) as call:
+            response = await client.chat.completions.create(...)
+            call.usage = response.usage
+    """
+
+    def __init__(self, endpoint: str, model: str, tracker: LLMUsageTracker = llm_usage):
+        self.endpoint = endpoint
+        self.model = model
+        self.tracker = tracker
+        self.usage = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.perf_counter() - self._started
+        if exc_type is None:
+            self.tracker.record(self.endpoint, self.model, self.usage, latency)
+        else:
+            self.tracker.record_error(self.endpoint, self.model, latency)
+        return False
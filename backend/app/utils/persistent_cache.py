@@ -0,0 +1,212 @@
+"""
+Persistent key-value cache backed by SQLite (WAL mode).
+
+Survives restarts/deploys and is shared by every uvicorn worker on the host, so repeated
+upstream queries (e.g. Naver shopping searches) don't burn the daily quota again.
+Values are stored as JSON; `None` is a valid value and is used for negative caching
+("this query has no result"), usually with a shorter TTL.
+
+The cache API is async: every statement (and JSON (de)serialization) runs on one dedicated
+thread per database, so a locked DB waiting out `busy_timeout` never stalls the event loop.
+Expired rows are skipped on read and deleted by a background purge every
+PERSISTENT_CACHE_PURGE_INTERVAL seconds (`start_purger()`), which also truncates the WAL.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CACHE_DIR = Path(os.getenv("KFIT_CACHE_DIR", Path(__file__).resolve().parents[2] / ".cache"))
+CACHE_DB_PATH = CACHE_DIR / "kfit_cache.sqlite3"
+PERSISTENT_CACHE_PURGE_INTERVAL = float(os.getenv("PERSISTENT_CACHE_PURGE_INTERVAL", "600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+class _Database:
+    """One SQLite connection per process, used from a dedicated thread via `run()`."""
+
+    def __init__(self, path: Path, schema: str = _SCHEMA):
+        self.path = path
+        self.schema = schema
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 쓰기 잠금 대기(busy_timeout)가 이벤트 루프를 막지 않도록 전용 스레드에서 실행
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{path.stem}")
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run `fn(*args)` (which calls execute/modify) on this database's thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(self.schema)
+            self._conn = conn
+        return self._conn
+
+    def execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def modify(self, sql: str, params: tuple = ()) -> int:
+        """Run an INSERT/UPDATE/DELETE and return the number of rows it changed."""
+        with self._lock:
+            return self._connect().execute(sql, params).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class PersistentCache:
+    def __init__(self, db: _Database, namespace: str, ttl: int, negative_ttl: int):
+        self._db = db
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _read(self, key: str) -> Tuple[bool, Any]:
+        rows = self._db.execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        )
+        return (True, json.loads(rows[0][0])) if rows else (False, None)
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value). `found` is True for negative entries too (value None)."""
+        try:
+            found, value = await self._db.run(self._read, key)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"[persistent_cache] {self.namespace} read failed: {e}")
+            return False, None
+
+        if not found:
+            self.misses += 1
+        elif value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return found, value
+
+    def _write(self, key: str, value: Any, ttl: float) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+        )
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        try:
+            await self._db.run(self._write, key, value, ttl)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"[persistent_cache] {self.namespace} write failed: {e}")
+
+    async def delete(self, key: str) -> None:
+        await self._db.run(self._db.execute, "DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    async def purge_expired(self) -> None:
+        await self._db.run(
+            self._db.execute, "DELETE FROM kv WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+_db = _Database(CACHE_DB_PATH)
+_caches: Dict[str, PersistentCache] = {}
+_purger_task: Optional[asyncio.Task] = None
+
+
+def get_persistent_cache(namespace: str, ttl: int = 7 * 86400, negative_ttl: int = 86400) -> PersistentCache:
+    if namespace not in _caches:
+        _caches[namespace] = PersistentCache(_db, namespace, ttl, negative_ttl)
+    return _caches[namespace]
+
+
+def persistent_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: c.stats() for name, c in _caches.items()}
+
+
+def _purge_sync() -> int:
+    # 이 프로세스에서 등록되지 않은 namespace도 포함해 전체 테이블 정리
+    removed = _db.modify("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+    if removed:
+        # 삭제로 커진 WAL 파일을 되돌림
+        _db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return removed
+
+
+async def purge_expired() -> None:
+    try:
+        removed = await _db.run(_purge_sync)
+    except sqlite3.Error as e:
+        logger.warning(f"[persistent_cache] purge failed: {e}")
+        return
+    if removed:
+        logger.info(f"[persistent_cache] purged {removed} expired rows")
+
+
+async def _purge_loop(interval: float) -> None:
+    while True:
+        await purge_expired()
+        await asyncio.sleep(interval)
+
+
+def start_purger(interval: float = PERSISTENT_CACHE_PURGE_INTERVAL) -> None:
+    """Purge expired rows now and then every `interval` seconds."""
+    global _purger_task
+    if _purger_task is None or _purger_task.done():
+        _purger_task = asyncio.create_task(_purge_loop(interval))
+
+
+async def stop_purger() -> None:
+    global _purger_task
+    if _purger_task is not None:
+        _purger_task.cancel()
+        try:
+            await _purger_task
+        except asyncio.CancelledError:
+            pass
+        _purger_task = None
+
+
+def close() -> None:
+    _db.close()
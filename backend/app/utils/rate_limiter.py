@@ -0,0 +1,241 @@
+"""
+Token-bucket rate limiter for upstream APIs with per-second quotas (Naver Open API).
+
+Callers `await limiter.acquire()` before each request. When the bucket is empty they queue,
+and queued callers are released in priority order (interactive requests before background
+prefetch). Bucket state lives in-process by default; with `shared=True` it is kept in the
+SQLite cache DB so every uvicorn worker on the host draws from the same budget. The shared
+update runs inline on the event loop, so it only waits SHARED_BUSY_TIMEOUT_MS for the DB lock;
+if another worker holds it longer, the call falls back to an in-process bucket.
+"""
+import os
+import time
+import heapq
+import asyncio
+import sqlite3
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.persistent_cache import CACHE_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# 공유 버킷 DB 잠금 대기 상한 (이벤트 루프에서 실행되므로 짧게)
+SHARED_BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_SHARED_BUSY_MS", "20"))
+
+# 숫자가 작을수록 먼저 처리
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 10
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("rate_limit_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def prefetch_priority():
+    """Mark upstream calls made inside this block as background prefetch (served last)."""
+    token = _priority.set(PRIORITY_PREFETCH)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _LocalBucketState:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self) -> float:
+        """Take one token if available (returns 0), else return seconds until one is."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class _SqliteBucketState:
+    """Bucket state shared across processes through a row in the cache DB."""
+
+    def __init__(self, path: Path, name: str, rate: float, capacity: float):
+        self.path = path
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=SHARED_BUSY_TIMEOUT_MS / 1000, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={SHARED_BUSY_TIMEOUT_MS}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _update(self, fn) -> float:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+                tokens, result = fn(tokens)
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now),
+                )
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def take(self) -> float:
+        def _take(tokens: float) -> Tuple[float, float]:
+            if tokens >= 1:
+                return tokens - 1, 0.0
+            return tokens, (1 - tokens) / self.rate
+        return self._update(_take)
+
+    def pause(self, seconds: float) -> None:
+        self._update(lambda tokens: (min(tokens, 0.0) - seconds * self.rate, 0.0))
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None, shared: bool = False):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        # 공유 상태를 쓸 수 없을 때(잠금 대기 초과 등)는 프로세스 로컬 버킷으로
+        self._local = _LocalBucketState(rate, self.capacity)
+        self._state = _SqliteBucketState(CACHE_DB_PATH, name, rate, self.capacity) if shared else self._local
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        # metrics
+        self.acquired = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pauses = 0
+        self.fallbacks = 0
+
+    def _take(self) -> float:
+        try:
+            return self._state.take()
+        except sqlite3.Error as e:
+            self.fallbacks += 1
+            logger.debug(f"[rate_limiter] {self.name} shared state unavailable, using local bucket: {e}")
+            return self._local.take()
+
+    async def acquire(self, priority: Optional[int] = None) -> float:
+        """Wait for a token. Returns the time spent waiting, in seconds."""
+        if priority is None:
+            priority = _priority.get()
+        started = time.perf_counter()
+
+        if not self._waiters and self._take() == 0.0:
+            self._record(0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        await future
+        waited = time.perf_counter() - started
+        self._record(waited)
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket for `seconds` (e.g. after the upstream answered 429)."""
+        self.pauses += 1
+        if self._state is not self._local:
+            # 공유 상태 실패 시에도 로컬 대체 버킷은 멈춰 둠
+            self._local.pause(seconds)
+        try:
+            self._state.pause(seconds)
+        except sqlite3.Error as e:
+            logger.warning(f"[rate_limiter] {self.name} pause failed: {e}")
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            # 취소된 대기자는 토큰을 쓰지 않고 제거
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                break
+            wait = self._take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+
+    def _record(self, waited: float) -> None:
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_sec": self.rate,
+            "capacity": self.capacity,
+            "shared": isinstance(self._state, _SqliteBucketState),
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "queue_depth": len(self._waiters),
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 1) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "pauses": self.pauses,
+            "fallbacks": self.fallbacks,
+        }
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+
+
+def get_rate_limiter(name: str, rate: float, capacity: Optional[float] = None, shared: bool = False) -> TokenBucketLimiter:
+    if name not in _limiters:
+        _limiters[name] = TokenBucketLimiter(name, rate, capacity, shared)
+    return _limiters[name]
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: l.stats() for name, l in _limiters.items()}
+
+
+# 네이버 지역검색 + 쇼핑검색은 같은 애플리케이션 키(초당 호출 제한)를 공유
+naver_limiter = get_rate_limiter(
+    "naver_openapi",
+    rate=float(os.getenv("NAVER_RATE_LIMIT_QPS", "8")),
+    shared=os.getenv("NAVER_RATE_LIMIT_SHARED", "").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,59 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight upstream call instead of
+each hitting the API (e.g. many users opening the same outfit, or the weather entry
+expiring under load). The shared call is shielded, so a caller that disconnects does not
+cancel the lookup for everyone else. If every caller leaves, the call still finishes (its
+result usually lands in a cache); a failure is then retrieved and logged here.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn()` for `key`, or wait for the call already in flight for that key."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 대기자가 모두 취소된 경우에도 예외를 회수 ("Task exception was never retrieved" 방지)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"[singleflight] {self.name}:{key} failed: {task.exception()!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: g.stats() for name, g in _groups.items()}
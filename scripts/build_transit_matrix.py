@@ -0,0 +1,104 @@
+"""
+Build the store-to-store transit matrix used by ODsayService.
+
+Queries ODsay for every ordered pair of curated stores in backend/app/data/stores.json and
+writes backend/app/data/transit_matrix.npy (+ transit_matrix.json). Pairs that fail are
+stored as missing and fall back to live ODsay calls at runtime.
+
+    python scripts/build_transit_matrix.py
+    python scripts/build_transit_matrix.py --base-url http://127.0.0.1:8090/v1/api --api-key test
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Define paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BASE_DIR, '..', 'backend')
+STORES_JSON_PATH = os.path.join(BACKEND_DIR, 'app', 'data', 'stores.json')
+
+sys.path.insert(0, BACKEND_DIR)
+load_dotenv(os.path.join(BASE_DIR, '..', '.env'))
+
+from app.services.odsay_service import ODsayService  # noqa: E402
+from app.services.transit_matrix import LEG_DTYPE, MATRIX_PATH, META_PATH, MISSING, build_index, encode_leg, save_matrix  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+
+
+async def build_matrix(base_url: str, api_key: str, concurrency: int, output_dir: str = None):
+    with open(STORES_JSON_PATH, 'r', encoding='utf-8') as f:
+        stores = json.load(f)
+
+    ids = [s['id'] for s in stores]
+    coords = [(s['location']['lat'], s['location']['lng']) for s in stores]
+    n = len(stores)
+
+    _, collisions = build_index(coords)
+    if collisions:
+        # 좌표가 같은 매장은 런타임에 구분할 수 없으므로 조회하지 않음 (MISSING → ODsay)
+        print(f"Warning: {len(collisions)} stores share coordinates, skipped: {', '.join(ids[i] for i in collisions)}")
+    skipped = set(collisions)
+
+    service = ODsayService()
+    service.base_url = base_url
+    service.api_key = api_key
+
+    records = np.zeros((n, n), dtype=LEG_DTYPE)
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def _fill(i: int, j: int):
+        nonlocal failed
+        async with semaphore:
+            # ok=False: HTTP 실패, ODsay {"error": ...} 응답 등 → MISSING으로 저장해 런타임에 재조회
+            ok, leg = await service._fetch_transit_route(coords[i][0], coords[i][1], coords[j][0], coords[j][1])
+        records[i, j] = encode_leg(leg if ok else None)
+        if not ok:
+            failed += 1
+
+    records["duration"] = MISSING
+    pairs = [(i, j) for i in range(n) for j in range(n) if i != j and i not in skipped and j not in skipped]
+    print(f"Querying {len(pairs)} store pairs ({n} stores) from {base_url}")
+    try:
+        await asyncio.gather(*[_fill(i, j) for i, j in pairs])
+    finally:
+        await http_clients.aclose()
+
+    matrix_path, meta_path = MATRIX_PATH, META_PATH
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        matrix_path = os.path.join(output_dir, os.path.basename(MATRIX_PATH))
+        meta_path = os.path.join(output_dir, os.path.basename(META_PATH))
+
+    save_matrix(
+        records, ids, coords,
+        matrix_path=matrix_path, meta_path=meta_path,
+        built_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        failed_pairs=failed,
+    )
+    print(f"Saved: {matrix_path} ({len(pairs) - failed}/{len(pairs)} pairs, {records.nbytes} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the store-to-store ODsay transit matrix")
+    parser.add_argument('--base-url', default=os.getenv('ODSAY_BASE_URL', 'https://api.odsay.com/v1/api'))
+    parser.add_argument('--api-key', default=os.getenv('ODSAY_API_KEY'))
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--output-dir', default=None, help="Defaults to backend/app/data")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("Error: ODSAY_API_KEY not set (use --api-key)")
+        sys.exit(1)
+
+    asyncio.run(build_matrix(args.base_url, args.api_key, args.concurrency, args.output_dir))
+
+
+if __name__ == "__main__":
+    main()